@@ -1,12 +1,177 @@
 #!/usr/bin/python
 
-import urllib2, json
-import feedparser as fp
+import json
+import sys, os, threading, Queue, bisect, time, re
+import cPickle, tempfile
 import MediaClasses
+import statsapi
 from datetime import datetime as dt
 from datetime import timedelta
 
-base_url = 'http://www.ultimate-numbers.com/rest/view'
+# The largest number of requests made to the ultimate-numbers
+# server at one time
+max_workers = 8
+# A dictionary of team names which resolve to a fixed ID in place of
+# the ID of the matching team in the league (if there is one).
+# Keys: normalized team names Values: team IDs
+team_aliases = { 'montreal royal' : 1234 }
+
+# The player statistics kept from the ultimate-numbers server
+player_stats = ["assists","goals","plusMinusCount","drops","throwaways","ds"]
+
+# How long after its start a game is thought of as being in progress
+game_length = timedelta(hours = 6)
+
+# The version of the saved league format. Saved leagues of another
+# version aren't loaded, so it must change whenever the classes do.
+state_version = 5
+
+def normalize_name(name):
+    """
+    Returns the form of a team name used to look teams up by name, ignoring
+    surrounding whitespace and casing.
+    """
+    return name.strip().lower()
+
+def fan_out(func, items, workers=None):
+    """
+    Calls func on every entry of items using a pool of at most workers
+    threads (max_workers by default) and returns a list of the results
+    in the same order as items.
+
+    If any call raises an exception, the first one is re-raised once
+    all of the calls have finished.
+    """
+    items = list(items)
+    workers = min(workers or max_workers, len(items))
+    if workers <= 1: return [func(item) for item in items]
+
+    results = [None]*len(items)
+    errors = []
+    jobs = Queue.Queue()
+    for job in enumerate(items): jobs.put(job)
+
+    def worker():
+        while True:
+            try:
+                i, item = jobs.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                results[i] = func(item)
+            except Exception:
+                errors.append(sys.exc_info())
+
+    threads = [threading.Thread(target=worker) for n in range(workers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads: thread.join()
+
+    if errors: raise errors[0][0], errors[0][1], errors[0][2]
+    return results
+
+def read_schedule(filename):
+    """
+    Reads a season schedule file* and returns its games indexed by team name.
+
+    Keys: team names Values: lists of (date, time, year, home team,
+    away team, opponent) tuples for each of that team's games
+
+    * expects a certain format (see 2014_AUDL_Schedule.json)
+    """
+    # open the json schedule doc
+    schedule = open(filename, 'r')
+    # convert the file data into a python object
+    data = json.loads(schedule.read())
+    schedule.close()
+
+    index = {}
+    for game in data:
+        d = game['date']
+        t = game['time']
+        y = game['Year']
+        opp = game['opponent']
+        if game['home/away'] == 'Home':
+            ht = game['team'].strip()
+            at = game['opponent'].strip()
+        else:
+            at = game['team'].strip()
+            ht = game['opponent'].strip()
+        index.setdefault(game['team'].strip(), []).append((d,t,y,ht,at,opp))
+    return index
+
+def read_players(filename):
+    """
+    Reads a season players file* and returns its players indexed by team name.
+
+    Keys: team names Values: lists of (first name, last name, number) tuples
+
+    * expects a certain format (see 2014_players.json)
+    """
+    f = open(filename, 'r')
+    players = json.load(f)
+    f.close()
+
+    index = {}
+    for player in players:
+        fn = player['Player First Name'].strip()
+        ln = player['Player Last Name'].strip()
+        num = player['Jersey #']
+        index.setdefault(player['Team'].strip(), []).append((fn,ln,num))
+    return index
+
+def records_by_date(data):
+    """
+    Groups the game records from the ultimate-numbers server by the day
+    each game was played. Each record's timestamp is parsed once.
+
+    Keys: date objects Values: lists of game records
+    """
+    records = {}
+    for record in data:
+        if "timestamp" in record:
+            day = dt.strptime(record['timestamp'][:10], "%Y-%m-%d").date()
+            records.setdefault(day, []).append(record)
+    return records
+
+def save_league(League, filename):
+    """
+    Saves a League to a file. The file is written under a temporary name
+    and renamed into place, so a crash part way through doesn't leave a
+    broken file behind. The temporary file is made by mkstemp, so no one
+    can guess its name or plant a link at it.
+    """
+    fd, temp_name = tempfile.mkstemp(prefix=os.path.basename(filename) + ".", suffix=".tmp",
+                                     dir=os.path.dirname(os.path.abspath(filename)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            cPickle.dump((state_version, League), f, cPickle.HIGHEST_PROTOCOL)
+        os.rename(temp_name, filename)
+    except:
+        os.remove(temp_name)
+        raise
+
+def load_league(filename):
+    """
+    Returns the League saved in a file, or None if there isn't one or
+    it can't be read.
+
+    Loading a file runs whatever code it was written to, so a file which
+    belongs to another user, or which others can write to, isn't loaded.
+    """
+    try:
+        with open(filename, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_uid != os.getuid() or stat.st_mode & 022:
+                print "Not loading the league from %s, as other users could have written it" % filename
+                return None
+            version, League = cPickle.load(f)
+    except (IOError, EOFError, ValueError, TypeError, AttributeError, ImportError, cPickle.UnpicklingError), e:
+        if os.path.exists(filename): print "Couldn't load the league from %s: %s" % (filename, e)
+        return None
+    if version != state_version: return None
+    return League
 
 class League():
     """  
@@ -15,6 +180,7 @@ class League():
     """ 
     def __init__(self):
         # A Video object containing the list of all the videos
+        # (fetched the first time it is asked for)
         self.Videos = MediaClasses.Videos();
         # A list of information about the upcoming
         # week in the AUDL
@@ -31,10 +197,38 @@ class League():
         # A list of RSS feeds the server is to
         # glean information from 
         self.RSS_feeds = ['http://www.theaudl.com/appfeed.xml'];
+        # A NewsStore of the articles from the RSS feeds, and the
+        # dictionary of those articles (Keys: GUIDs or links
+        # Values: Article class instances)
+        self.News_store = MediaClasses.NewsStore()
+        self.News = self.News_store.Articles
         # A dictionary containing lists of the top five 
         # players for a given statistic and their stat
         # in sorted order
         self.Top_fives = { 'Goals': [], 'Assists': [], 'Drops': [], 'Throwaways': [], 'PMC': [], 'Ds': [] }
+        # A dictionary for looking up the league's teams by name
+        # Keys: normalized team names Values: Team class instances
+        self.Team_names = {}
+        # A GameStore containing every game in the league
+        self.Game_store = GameStore(self)
+        # A dictionary of each team's record, kept up to date as game
+        # scores change. Keys: team IDs Values: [wins, losses, point differential]
+        self.Records = {}
+        # The standings built from Records. Set to None when a record
+        # changes so that it is rebuilt on the next request.
+        self.Standings_table = None
+        # A dictionary containing the players of all teams in order
+        # of each statistic. Keys: stat names Values: Leaderboard class instances
+        self.Leaderboards = dict((stat, Leaderboard()) for stat in player_stats)
+        # A dictionary of season files read by the league's teams
+        # Keys: (file name, reader name) Values: the index built by the reader
+        self.Season_files = {}
+        # An int counting the changes made to the league's data.
+        # It is bumped each time teams, games or news are (re)loaded
+        # so that anything built from the data can tell it is stale.
+        self.Generation = 0
+        # The time (in seconds since the epoch) the league's data last changed
+        self.Last_update = time.time()
 
 
     def add_teams(self, filename='Teams_Info', players = True, games = True, stats = True):
@@ -48,7 +242,8 @@ class League():
 
         For each team, the basic info for that team is taken from a file
         in the repository and their game information is retrieved from the 
-        ultimate-numbers server. 
+        ultimate-numbers server. Requests to the server for all teams are
+        made concurrently (see fan_out).
         
         * expects a certain format (see Teams_Info)
         """
@@ -57,6 +252,13 @@ class League():
         found = False
         self.Teams={}
         self.Divisions = {}
+        self.Team_names = {}
+        self.Game_store = GameStore(self)
+        self.Records = {}
+        self.Standings_table = None
+        self.Leaderboards = dict((stat, Leaderboard()) for stat in player_stats)
+        # Read the season files afresh for this set of teams
+        self.Season_files = {}
         for line in teams_info: 
               # See if we've reached the beginning of
               # some team info
@@ -81,33 +283,59 @@ class League():
                        City = line[1:].rstrip()
                        # Create the new team class
                        self.Teams[ID] = Team(self, ID, Name, City)
+                       self.index_team(self.Teams[ID])
+                       self.Records[ID] = [0, 0, 0]
         if not found: print "No Team with that ID on record"
    
-        # Gives each team its ID value so it can grab its own information from the server.
-        for team in self.Teams:
-            if players: self.Teams[team].add_players()
-            if games:   self.Teams[team].add_games(), self.Teams[team].get_games_info()
-            if stats:   self.Teams[team].add_player_stats()
+        teams = self.Teams.values()
+        # Load the information kept in local files first, one team at a
+        # time, as teams share the game instances they have in common.
+        for team in teams:
+            if players: team.add_players()
+            if games:   team.add_games()
+
+        # Fetch every team's information from the server at once
+        fetches = []
+        if games: fetches += [team.fetch_games_data for team in teams]
+        if stats: fetches += [team.fetch_player_data for team in teams]
+        data = fan_out(lambda fetch: fetch(), fetches)
 
-            if stats:   self.Teams[team].populate_team_stats()
+        for team in teams:
+            if games:   team.get_games_info(data.pop(0))
+        for team in teams:
+            if stats:   team.add_player_stats(data.pop(0))
+            if stats:   team.populate_team_stats()
         teams_info.close()
+        self.data_changed()
 
-    def get_news(self):
+    def data_changed(self):
+        """
+        Marks that the league's teams, games or news have been (re)loaded
+        by moving on to the next data generation.
+        """
+        self.Last_update = time.time()
+        self.Generation += 1
+
+    def season_file(self, filename, reader):
         """
-        Gets all news articles for the rss feeds provided to the League class
+        Returns the index built by reader (read_schedule or read_players)
+        from a season file. The file is only read the first time it is
+        asked for, every team after that uses the same index.
         """
-        # A dictionary containing all related news article
-        # class instances
-        self.News = {};
+        key = (filename, reader.__name__)
+        if key not in self.Season_files:
+            self.Season_files[key] = reader(filename)
+        return self.Season_files[key]
 
-        for feed in self.RSS_feeds:
-            # parse the feed into a python dictionary
-            data = fp.parse(feed)
-            # create a new article for each article in the feed
-            # later, we will need to limit the number of articles in the feed
-            for ent in data.entries:
-                temp_news_class = MediaClasses.Article(ent.published, ent.link, ent.title)
-                self.News[id(temp_news_class)] = temp_news_class
+    def get_news(self):
+        """
+        Gets all news articles for the rss feeds provided to the League class.
+        The feeds are fetched concurrently, asking only for feeds which have
+        changed, and only articles which are new are added.
+        """
+        feeds = fan_out(self.News_store.fetch, self.RSS_feeds)
+        added = sum([self.News_store.merge(entries) for entries in feeds])
+        if added: self.data_changed()
     
     def team_list(self):
         """
@@ -126,24 +354,8 @@ class League():
         """
         Returns information needed to populate the news page in the app UI
         """
-        # Init the output list, add a header
-        art_list = []
-        # shorten the path to the News dictionary
-        News = self.News
-        # Get the title and article url for every article
-        # create a tuple and append to the output lits
-        for art in News:
-            #Only show the date on the app
-            ts = News[art].Timestamp.encode('ascii', 'ignore')
-            #Break by spacing
-            ts = ts.split(" ")
-            # Join only the day, month, year components
-            ts = " ".join(ts[1:4])
-            art_tup = (News[art].Title, News[art].url, ts)
-            art_list.append(art_tup)
-        art_list.sort(key = lambda set: dt.strptime(set[2], "%d %b %Y"), reverse = True)
-        art_list=["AUDL News"]+art_list
-        return art_list
+        # the store keeps the articles in order, newest first
+        return ["AUDL News"] + self.News_store.Page
 
     def league_game_exist(self, name, date):
         """
@@ -151,15 +363,9 @@ class League():
         for a given date. 
 
         """
-
-        for team in self.Teams:
-            AUDL_Name = self.Teams[team].City + " " + self.Teams[team].Name
-
-            if AUDL_Name in name:
-                return self.Teams[team].game_exist(date)
-            else:
-                pass
-        return False,None
+        team = self.name_to_team(name)
+        if team is None: return False,None
+        return team.game_exist(date)
         
     def return_upcoming_games(self, teams=None, days_ahead=14, scores=False, now=None):
         """
@@ -177,20 +383,11 @@ class League():
             return []
 
         data_out = []
-        # If no teams are passed in, add all available teams to the schedule
-        if teams == None:
-            teams = []
-            for ID,team in self.Teams.items():
-                teams.append(ID)
-   
-        game_list = []
-        #loop through each team and get their game class instances
-        for team in teams:
-            games = self.Teams[team].Games
-            for game in games:
-                inst = self.Teams[team].Games[game]                    
-                if inst not in game_list: game_list.append(inst)
-        
+        now = dt.today().date() if now == None else now
+        # The game store keeps games in date order, so the games we want
+        # are those up to the last date allowed
+        game_list = self.Game_store.games_until(now + timedelta(days = days_ahead), teams)
+
         for game in game_list:
             date = game.date
             time = game.time
@@ -204,16 +401,9 @@ class League():
             else:
                 score = "0-0"             
 
-            game_date = dt.strptime(game.date, "%m/%d/%y").date()
-            now = dt.today().date() if now == None else now
-            delta = game_date-now
-            if delta.days > days_ahead:
-                pass
-            else:
-                game_tup=(team1,team1ID,team2,team2ID,date,time,score)
-                data_out.append(game_tup) if scores else data_out.append(game_tup[:-1])
+            game_tup=(team1,team1ID,team2,team2ID,date,time,score)
+            data_out.append(game_tup) if scores else data_out.append(game_tup[:-1])
        
-        data_out.sort(key= lambda set: dt.strptime(set[4], '%m/%d/%y'))
         return data_out
 
     def return_schedules(self):
@@ -226,25 +416,18 @@ class League():
         return data_out
 
     def top_five_league(self, stat):
+        """
+        Returns a list of (player name, stat value, team ID) tuples for the
+        five players in the league with the highest value of stat.
+        """
+        return self.leaders(stat, 5)
 
-        top_player_stat_list = []
-        #traverse through all teams to get top 5
-        for team in self.Teams:
-            #should add a team indicator to this tuple
-            team_list = self.Teams[team].top_five(stat)
-            '''
-            here we pop each player off the list and add them 
-            back to the list with a team id
-            '''
-            for player in team_list:
-                playerOne = team_list.pop(0)
-                team_list.append( ( playerOne[0], playerOne[1], team ) )
-            #add each teams list into a total list
-            top_player_stat_list = top_player_stat_list + team_list
-        #sort from highest to lowest based on stat quantity
-        top_player_stat_list.sort( key = lambda set: set[1], reverse=True )
-        #returns the top 5 tuples from the list.
-        return top_player_stat_list[0:5]
+    def leaders(self, stat, n):
+        """
+        Returns a list of (player name, stat value, team ID) tuples for the
+        n players in the league with the highest value of stat.
+        """
+        return self.Leaderboards[stat].top(n)
 
     def get_stats_league(self):
         #dictionary of stats with formal and informal names as [0][1]
@@ -268,38 +451,54 @@ class League():
         return self.Top_fives
 
     def get_videos(self):
-
-        '''
-        check timestamp to see how out of date we are...currently not implemented
-        pseudocode
-            check current timestamp to last video class timestamp 
-            (timestamp updated only when videos are refreshed, not when accessed)
-            
-            if time elapsed is greater than some amount of time:
-                run a refresh method on vids class
-                return refreshed list
-
-            else return our stored list
-        
-        '''
+        """
+        Returns the list of videos. The list is fetched the first time it is
+        asked for; once it is out of date it is refreshed in the background
+        and the old list returned until the refresh is done.
+        """
         return self.Videos.videos
 
+    def videos_modified(self):
+        """
+        Returns the time the list of videos last changed (None if it
+        hasn't been fetched).
+        """
+        return self.Videos.Last_modified
+
+    def update_videos(self):
+        """
+        Refreshes the list of videos and moves on to the next data
+        generation if it changed since the last one. A list refreshed in
+        the background counts as a change too.
+        """
+        self.Videos.refresh()
+        if self.Videos.Last_modified > self.Last_update:
+            self.data_changed()
+
+    def index_team(self, team):
+        """
+        Adds a team to the index used to look teams up by name.
+        """
+        self.Team_names[normalize_name(team.full_name())] = team
+
+    def name_to_team(self, name):
+        """
+        Returns the Team class instance with a matching name, or None
+        if there isn't one in the league.
+        """
+        return self.Team_names.get(normalize_name(name))
+
     def name_to_id(self, name):
         """
-        Loops through each team to look for a matching name. 
+        Looks up the team with a matching name. 
         If one is found, then the id is returned as an int.
         """
- 
-        #loop through teams and find a match:
-        teams = self.Teams
-
+        key = normalize_name(name)
         # Corner case for the Royal
-        if name == "Montreal Royal": return 1234
-        for ID, team_inst in teams.items():
-            AUDL_name = team_inst.City + " " + team_inst.Name
-            if AUDL_name in name.rstrip(): return ID
+        if key in team_aliases: return team_aliases[key]
+        team = self.Team_names.get(key)
         # false case is a corner case until 2014 games begin
-        return 0
+        return team.ID if team is not None else 0
 
     def return_scores_page(self):       
         
@@ -310,25 +509,97 @@ class League():
         return data_out
 
     def standings(self):
-       
+        """
+        Returns the standings for each division. The standings are built
+        from the records kept by count_game and only rebuilt after a
+        record has changed.
+        """
+        if self.Standings_table != None: return self.Standings_table
+
         standings_list=[]
         for div,teams in self.Divisions.items():
             div_list=[]
-            #print teams
             for team in teams:
                 t = self.Teams[team]
-                rec = t.record()
+                rec = self.Records[team]
                 team_rec_tup = (t.full_name(),rec[0], rec[1], rec[2])
                 div_list.append(team_rec_tup)
             div_list.sort(key= lambda set: (set[1],set[2],set[3]), reverse=True)
             div_list.insert(0,div)
             standings_list.append(div_list)
 
+        self.Standings_table = standings_list
         return standings_list
 
-    def update_games(self):
-        for name,team in self.Teams.items():
-            team.get_games_info()
+    def count_game(self, ID, game, score, sign=1):
+        """
+        Adds the result of a game with the given (home score, away score)
+        to the record of the team with this ID. A sign of -1 takes the
+        result back out of the record.
+        """
+        if ID not in self.Records: return
+        rec = self.Records[ID]
+        home_score, away_score = score
+        game_diff = home_score-away_score
+        # the same test Team.record uses to tell which side the team is on
+        if self.Teams[ID].full_name() in game.home_team:
+            rec[0] += sign if home_score > away_score else 0
+            rec[1] += sign if home_score < away_score else 0
+            rec[2] += sign*game_diff
+        else:
+            rec[0] += sign if home_score < away_score else 0
+            rec[1] += sign if home_score > away_score else 0
+            rec[2] -= sign*game_diff
+        self.Standings_table = None
+
+    def score_changed(self, game, old_score):
+        """
+        Updates the records of the teams playing in game after its score has
+        changed. old_score is the previous (home score, away score) of the
+        game or None if it didn't have a score yet.
+        """
+        new_score = (game.home_score, game.away_score)
+        for ID in self.Game_store.game_teams(game):
+            if old_score != None: self.count_game(ID, game, old_score, -1)
+            self.count_game(ID, game, new_score)
+
+    def update_games(self, teams=None):
+        """
+        Updates the scores of the games in the league and returns the number
+        of games matched again. The games for every team are fetched from
+        the server at once.
+
+        teams - a list of team IDs. If given, only these teams are updated.
+        """
+        if teams is None: teams = self.Teams.keys()
+        teams = [self.Teams[ID] for ID in teams]
+        data = fan_out(lambda team: team.fetch_games_data(), teams)
+        matched = 0
+        for team, games_data in zip(teams, data):
+            matched += team.get_games_info(games_data)
+        if matched: self.data_changed()
+        return matched
+
+    def live_teams(self, now=None):
+        """
+        Returns the set of IDs of teams with a game in progress.
+        """
+        if now is None: now = dt.now()
+        teams = set()
+        # a game which started late yesterday may still be going
+        for day in (now.date() - timedelta(days = 1), now.date()):
+            for game in self.Game_store.games_on(day):
+                if game.in_progress(now): teams |= self.Game_store.game_teams(game)
+        return teams
+
+    def update_live_games(self):
+        """
+        Updates the scores of the teams with a game in progress. Nothing
+        is fetched if there aren't any.
+        """
+        teams = self.live_teams()
+        if not teams: return 0
+        return self.update_games(teams)
 
 class Team():
     """
@@ -350,89 +621,144 @@ class Team():
          self.Name = Name
          # A string containing the Team's City
          self.City = City
+         # The games data from ultimate-numbers which was last matched to
+         # the team's games, and its records grouped by date
+         # Keys: date objects Values: lists of game records
+         self.Games_data = None
+         self.Game_records = {}
+         # A list of the names of players who couldn't be matched to
+         # the ultimate-numbers server the last time stats were added
+         self.Unmatched_players = []
         
     def add_players(self, filename='2014_players.json',stats=True):
         """
         Adds players to the Team class attribute 'Players' from the json file.
         """
 
+        # take any players the team had before off the league's leaderboards
+        if self.League != None and hasattr(self, 'Players'):
+            for board in self.League.Leaderboards.values():
+                for name in self.Players: board.remove((self.ID, name))
+
         # A dictionary containing a set of Player class
         # instances pertaining to this team.
         self.Players = {}
 
-        # open the json file
-        f = open(filename, 'r')
+        # get the players from the league's copy of the file if we can
+        if self.League != None:
+            players = self.League.season_file(filename, read_players)
+        else:
+            players = read_players(filename)
 
-        players= json.load(f)
+        for fn, ln, num in players.get(self.full_name(), []):
+            full_name = fn + " " + ln
+            self.Players[full_name]=Player(fn,ln,num)
+        self.update_leaderboards()
 
-        for player in players:
-            if self.full_name() in player['Team']:
-                fn = player['Player First Name'].strip()
-                ln = player['Player Last Name'].strip()
-                num = player['Jersey #']
-                full_name = fn + " " + ln
-                self.Players[full_name]=Player(fn,ln,num)
-        f.close()
+    def update_leaderboards(self):
+        """
+        Gives the league's leaderboards the current stats of the team's
+        players. Only the players whose stats have changed are moved.
+        """
+        if self.League == None: return
+        for stat, board in self.League.Leaderboards.items():
+            for name, player in self.Players.items():
+                value = player.Stats[stat] if stat in player.Stats else 0
+                board.update((self.ID, name), player.full_name(), value)
 
-    def add_player_stats(self):
+    def fetch_player_data(self):
+        """
+        Gets the player summary data and player stat data for the team
+        from the ultimate-numbers server. Returns None for teams whose
+        information can't be accessed.
+        """
+        # These two teams currently have passwords, until we have access to their info, do nothing. 
+        if self.full_name() == "Seattle Raptors" or self.full_name() == "New York Empire" : return None
+        # get player summary data
+        gen_player_data = statsapi.get_json("/team/"+str(self.ID)+"/players/")
+        # get player stat data
+        player_stats_data = statsapi.get_json("/team/"+str(self.ID)+"/stats/player")
+        return gen_player_data, player_stats_data
+
+    def add_player_stats(self, data=None):
         """
         Adds player name, number, stats, etc. to a player class. 
 
+        data - the player data returned by fetch_player_data. If not given,
+               it is fetched from the server.
+
         Assumes the ultimate-numbers info has already been loaded.
+
+        Players are matched to the server's players by jersey number and
+        then to their stats by the server's name for them. Returns a list
+        of the names of players who couldn't be matched, which is also kept
+        in Unmatched_players.
         """
-        # These two teams currently have passwords, until we have access to their info, do nothing. 
-        if self.full_name() == "Seattle Raptors" or self.full_name() == "New York Empire" : return 0
-        # get player summary data
-        base_url = 'http://www.ultimate-numbers.com/rest/view'
-        req1 = urllib2.Request(base_url+"/team/"+str(self.ID)+"/players/")
-        # print base_url+"/team/"+str(self.ID)+"/players/"
-        response1 = urllib2.urlopen(req1)
-        gen_player_data = json.loads(response1.read())
+        if data is None: data = self.fetch_player_data()
+        if data is None: return []
+        gen_player_data, player_stats_data = data
 
-        # get player stat data
-        req2 = urllib2.Request(base_url+"/team/"+str(self.ID)+"/stats/player")
-        response2 = urllib2.urlopen(req2)
-        player_stats_data = json.loads(response2.read())
+        # index the server's names for the players by jersey number and
+        # the stats by those names (the last of any repeats is used)
+        stat_names = dict((row['number'], row['name']) for row in gen_player_data)
+        stat_rows = dict((row['playerName'], row) for row in player_stats_data)
 
-        # match player to their Ultimate-Numbers name by their Jersey number
+        unmatched = []
         for name, player in self.Players.items():
-            for data in gen_player_data:
-                #print data['number'], player.Number, self.Name, player.full_name()
-                if data['number'] == str(player.Number):
-                    #print data['name']
-                    self.Players[name].stat_name = data['name']
-
-        stats = ["assists","goals","plusMinusCount","drops","throwaways","ds"]
-        for name,player in self.Players.items():
-           for player_stats in player_stats_data:
-               if  hasattr(player,'stat_name') and player_stats['playerName'] == player.stat_name:
-                   for stat in stats:
-                       player.Stats[stat]  = player_stats[stat] if stat in player_stats else 0
+            # match player to their Ultimate-Numbers name by their Jersey number
+            if str(player.Number) in stat_names:
+                player.stat_name = stat_names[str(player.Number)]
+            stat_data = stat_rows.get(getattr(player, 'stat_name', None))
+            if stat_data is None:
+                unmatched.append(name)
+                continue
+            for stat in player_stats:
+                player.Stats[stat] = stat_data[stat] if stat in stat_data else 0
+        self.update_leaderboards()
+
+        unmatched.sort()
+        self.Unmatched_players = unmatched
+        return unmatched
+
+    def add_player_numbers(self, players=None, data=None):
+        """
+        Matches players to the server's players by name and gives them the
+        server's jersey numbers. Returns a list of the names of players
+        who couldn't be matched.
+
+        players - a list of Player class instances (all of the team's
+                  players if not given)
+        data - the player summary data from the ultimate-numbers server.
+               If not given, it is fetched from the server once for all
+               of the players.
+        """
+        if players is None: players = self.Players.values()
+        if data is None: data = statsapi.get_json("/team/"+str(self.ID)+"/players/")
+
+        # the server's players by name (the last of any repeats is used)
+        numbers = dict((row['name'], row['number']) for row in data if 'number' in row)
+
+        unmatched = []
+        for player in players:
+            # the server uses either the player's full or first name
+            for name in (player.full_name(), player.First_name):
+                if name in numbers:
+                    player.Number = numbers[name]
+                    break
+            else:
+                unmatched.append(player.full_name())
+        return sorted(unmatched)
 
     def add_player_number(self,player_class):
         """
         Grabs a different player info endpoint from the ultimate-numbers server
         to match player numbers to name
         """
-        # Get data from the appropriate ultimate-numbers 
-        # endpoint
-        base_url = 'http://www.ultimate-numbers.com/rest/view'
-        req = urllib2.Request(base_url+"/team/"+str(self.ID)+"/players/")
-        response = urllib2.urlopen(req)
-        data = json.loads(response.read())
-        
-        # Check each player in the Team instance for a name that matches
-        # a player in this endpoint (by name). If they exist, then add 
-        # the player's number to their Player class instance.
-        for player in data:
-            if player['name'] == player_class.First_name:
-               try:
-                   player_class.Number = player['number']
-               except:
-                   print "Could not match player number for", player['name'],
-                   print "on the", self.City, self.Name
-                   pass
-            
+        unmatched = self.add_player_numbers([player_class])
+        if unmatched:
+            print "Could not match player number for", player_class.full_name(),
+            print "on the", self.City, self.Name
+
     def top_five(self, stat):
         """
         Generates a list of tuples for the a given *stat*. 
@@ -490,50 +816,36 @@ class Team():
         # create a name that will match one in the json doc
         AUDL_Name = self.City + " " + self.Name
 
-        # open the json schedule doc
-        schedule = open(filename, 'r')
-        # convert the file data into a python object
-        data = json.loads(schedule.read())
+        # the team no longer belongs to any games it had before
+        if self.League != None and hasattr(self, 'Games'):
+            for game in self.Games.values(): self.League.Game_store.drop(self, game)
         self.Games={}
- 
-        team_games = []
-        # if the game belongs to the current team, add it
-        # to a list of essential game data
-        for game in data:
-            if AUDL_Name in game['team']:
-                d = game['date']
-                t = game['time']
-                y = game['Year']
-                opp = game['opponent']
-                #debug stuff
-                #if game['team'].strip() == "San Jose Spiders": print opp, game['team'], d
-                #if opp.strip() == "San Jose Spiders": print opp, game['team'], d
-                if game['home/away'] == 'Home':
-                    ht = game['team'].strip()
-                    at = game['opponent'].strip()
-                  
-                else:
-                    at = game['team'].strip()
-                    ht = game['opponent'].strip()
-                  
-                team_games.append((d,t,y,ht,at,opp))
+        # the new games haven't been matched to any records yet
+        self.Games_data = None
+        self.Game_records = {}
+
+        # get the schedule from the league's copy of the file if we can
+        if self.League != None:
+            schedule = self.League.season_file(filename, read_schedule)
+        else:
+            schedule = read_schedule(filename)
+        # the essential game data for all of this team's games
+        team_games = schedule.get(AUDL_Name, [])
 
         #Check to see if the team belongs to a league
         if self.League != None:
-            # If yes, check to see if this game already exists
-            # in the league
+            # If yes, use the league's instance of the game, which
+            # is created by whichever of its teams is added first
+            store = self.League.Game_store
             for game in team_games:
-                
-                exists,existing_game = self.League.league_game_exist(game[-1], game[0])
-                self.Games[game[0]] = existing_game if exists else Game(game[0],game[1],game[2],game[3],game[4])
+                # only the last game on a given date is kept
+                if game[0] in self.Games: store.drop(self, self.Games[game[0]])
+                self.Games[game[0]] = store.add(self, game[0],game[1],game[2],game[3],game[4])
         # If no, then just add a new game class for this team.
         else: 
             for game in team_games:
                 self.Games[game[0]] = Game(game[0],game[1],game[2],game[3],game[4])
-            
-        
-                #self.Games[game['date']] = Game(d,t,y,ht,at)
-        schedule.close()
+
     def populate_team_stats(self):
        """
        Gets the top five players for each stat in stat_list (hardcoded)
@@ -564,15 +876,14 @@ class Team():
         AUDL_Name = self.City+ " " + self.Name
 
         sched = []
-        for game in self.Games:
-            if AUDL_Name in self.Games[game].home_team:
-                opponent = self.Games[game].away_team
+        for game in sorted(self.Games.values(), key= lambda game: game.game_date):
+            if AUDL_Name in game.home_team:
+                opponent = game.away_team
             else:
-                opponent = self.Games[game].home_team
-            game_tup = (self.Games[game].date, self.Games[game].time, opponent, self.League.name_to_id(opponent))
+                opponent = game.home_team
+            game_tup = (game.date, game.time, opponent, self.League.name_to_id(opponent))
             sched.append(game_tup)
 
-        sched.sort(key= lambda set: dt.strptime(set[0], '%m/%d/%y'))
         sched = [AUDL_Name, self.ID ]+sched
         return sched
 
@@ -586,7 +897,7 @@ class Team():
         AUDL_Name = self.City+ " " + self.Name
         games = self.Games
         scores_list = []
-        for game in games:
+        for game in sorted(games, key= lambda game: games[game].game_date):
             # set game score. if the game hasn't started yet, default to 0-0
             score = '0-0' if games[game].Score == [] else games[game].Score
             # set oppponent name to whichever team doesn't match the team for which we're 
@@ -596,7 +907,6 @@ class Team():
             game_tup = (games[game].date, opp, score)
             # add the tuple to the scores list for the current team
             scores_list.append(game_tup)
-        scores_list.sort(key = lambda set: dt.strptime(set[0], '%m/%d/%y'))
         scores_list=[self.City + " " + self.Name]+scores_list
         return scores_list
 
@@ -636,37 +946,216 @@ class Team():
 
         return self.City + " " + self.Name
 
-    def get_games_info(self):
-
+    def fetch_games_data(self):
+        """
+        Gets the list of games for the team from the ultimate-numbers
+        server. Returns None for teams whose information can't be accessed.
+        """
         # corner case for teams whose information requires authentication (for now)
-        if self.full_name() == "Seattle Raptors" or self.full_name() == "New York Empire": return 0
+        if self.full_name() == "Seattle Raptors" or self.full_name() == "New York Empire": return None
         #get the list of games for the team from ultimate-numbers
-        base_url = 'http://www.ultimate-numbers.com/rest/view'
+        return statsapi.get_json("/team/" + str(self.ID) + "/games")
+
+    def get_games_info(self, data=None):
+        """
+        Matches the team's games to their scores on the ultimate-numbers server.
 
-        full_url = base_url + "/team/" + str(self.ID) + "/games"
+        data - the games list returned by fetch_games_data. If not given,
+               it is fetched from the server.
 
-        req = urllib2.Request(full_url)
+        Nothing is done if data is the same list that was matched last time,
+        which is what the stats client returns when the server's copy hasn't
+        changed. Otherwise only the games whose records differ from last
+        time are matched again.
 
-        response = urllib2.urlopen(req)
+        Returns the number of games which were matched.
+        """
+        if data is None: data = self.fetch_games_data()
+        if data is None or data is self.Games_data: return 0
 
-        data = json.loads(response.read())
+        records = records_by_date(data)
 
         games = self.Games
+        matched = 0
 
         for game in games:
+            day = games[game].game_date
+            day_records = records.get(day, [])
+            if day_records == self.Game_records.get(day, []): continue
+            matched += 1
             if self.full_name() in games[game].home_team:
-               games[game].match_game(data, True)
+               games[game].match_records(day_records, True)
             elif self.full_name() in games[game].away_team:
-               games[game].match_game(data, False)
+               games[game].match_records(day_records, False)
             else:
                print "GAME DOESN'T BELONG TO THIS TEAM"
 
+        self.Games_data = data
+        self.Game_records = records
+        return matched
+
+
+
+class Leaderboard():
+    """
+    Keeps the players of a league in order of their value for a single
+    statistic, highest first, so that the leaders for the stat can be
+    read straight off the front.
+    """
+    def __init__(self):
+        # A dictionary of the entries on the board
+        # Keys: (team ID, player name) Values: the player's entry in Order
+        self.Entries = {}
+        # A list of (-value, count, team ID, player name, value) entries kept
+        # sorted. The count keeps players with equal values in the order
+        # they reached that value.
+        self.Order = []
+        # A count of the entries made so far
+        self.Count = 0
+
+    def update(self, key, name, value):
+        """
+        Sets the value for the player with key (team ID, player name).
+        Nothing is done if the player's value hasn't changed.
+        """
+        entry = self.Entries.get(key)
+        if entry != None and entry[4] == value: return
+        self.remove(key)
+        self.Count += 1
+        entry = (-int(value), self.Count, key[0], name, value)
+        bisect.insort(self.Order, entry)
+        self.Entries[key] = entry
+
+    def remove(self, key):
+        """
+        Takes the player with key (team ID, player name) off the board.
+        """
+        entry = self.Entries.pop(key, None)
+        if entry == None: return
+        del self.Order[bisect.bisect_left(self.Order, entry)]
+
+    def top(self, n):
+        """
+        Returns (player name, value, team ID) tuples for the n players
+        with the highest values.
+        """
+        return [(entry[3], entry[4], entry[2]) for entry in self.Order[:n]]
+
+    def __len__(self):
+        return len(self.Order)
+
+class GameStore():
+    """
+    Keeps a single Game class instance for each game in a league, shared
+    by the teams playing in it. Games are also kept in order of their
+    dates so that the games in a range of dates can be sliced out.
+    """
+    def __init__(self, League=None):
+        # The League class instance the store's games belong to
+        self.League = League
+        # A dictionary of all games in the store
+        # Keys: (date, home team, away team) Values: Game class instances
+        self.Games = {}
+        # A dictionary of the teams each game belongs to
+        # Keys: same as Games Values: sets of team IDs
+        self.Teams = {}
+        # A list of (game date, count, key) tuples in date order. The count
+        # keeps games on the same date in the order they were added.
+        self.Dates = []
+
+    def key(self, date, home_team, away_team):
+        """
+        Returns the key that identifies a game in the store.
+        """
+        return (date, normalize_name(home_team), normalize_name(away_team))
+
+    def add(self, team, date, time, year, home_team, away_team):
+        """
+        Returns the store's Game class instance for the given game, creating
+        it if the game isn't in the store yet, and records that the game
+        belongs to team.
+        """
+        key = self.key(date, home_team, away_team)
+        if key not in self.Games:
+            game = Game(date, time, year, home_team, away_team)
+            game.League = self.League
+            self.Games[key] = game
+            self.Teams[key] = set()
+            bisect.insort(self.Dates, (game.game_date, len(self.Dates), key))
+        game = self.Games[key]
+        if team.ID not in self.Teams[key]:
+            self.Teams[key].add(team.ID)
+            # count a game which already has a score in the team's record
+            if self.League != None and game.has_score():
+                self.League.count_game(team.ID, game, (game.home_score, game.away_score))
+        return game
+
+    def drop(self, team, game):
+        """
+        Records that game no longer belongs to team. The game stays in the
+        store for any other teams playing in it.
+        """
+        key = self.key(game.date, game.home_team, game.away_team)
+        if team.ID not in self.Teams.get(key, ()): return
+        self.Teams[key].discard(team.ID)
+        if self.League != None and game.has_score():
+            self.League.count_game(team.ID, game, (game.home_score, game.away_score), -1)
+
+    def game_teams(self, game):
+        """
+        Returns the set of IDs of the teams that game belongs to.
+        """
+        return self.Teams.get(self.key(game.date, game.home_team, game.away_team), set())
 
+    def games_until(self, last_date, teams=None):
+        """
+        Returns the games on or before last_date in date order.
 
-class Player():
+        teams - a list of team IDs. If given, only games belonging to one
+                of these teams are returned.
+        """
+        end = bisect.bisect_right(self.Dates, (last_date, len(self.Dates)))
+        keys = [entry[2] for entry in self.Dates[:end]]
+        if teams != None:
+            teams = set(teams)
+            keys = [key for key in keys if not self.Teams[key].isdisjoint(teams)]
+        return [self.Games[key] for key in keys]
+
+    def games_on(self, day):
+        """
+        Returns the games on a given date.
+        """
+        start = bisect.bisect_left(self.Dates, (day,))
+        end = bisect.bisect_right(self.Dates, (day, len(self.Dates)))
+        return [self.Games[entry[2]] for entry in self.Dates[start:end]]
+
+    def __len__(self):
+        return len(self.Games)
+
+def lazy_container(slot, kind):
+    """
+    Returns a property for a container attribute kept in slot which is
+    only made (by calling kind) the first time it is used.
+    """
+    def get(self):
+        value = getattr(self, slot, None)
+        if value is None:
+            value = kind()
+            setattr(self, slot, value)
+        return value
+    def set(self, value):
+        setattr(self, slot, value)
+    return property(get, set)
+
+class Player(object):
     """
     A class for containing information about a player.
+
+    Players and games are kept for every team and season, so both use
+    __slots__ rather than a dictionary of attributes for each instance.
     """
+    __slots__ = ('Stats', 'First_name', 'Last_name', 'Number', 'Height', 'Weight', 'Age', 'stat_name')
+
     def __init__(self,first_name,last_name,number):
         # A dictionary containing the players stats.
         # Keys: stat names Values: player's statistic 
@@ -683,6 +1172,8 @@ class Player():
         self.Weight = ''
         # string containing the player's age
         self.Age = 0
+        # The player's name on the ultimate-numbers server is kept in
+        # stat_name once the player has been matched to it
 
     def full_name(self):
         """
@@ -690,10 +1181,22 @@ class Player():
         """
         return self.First_name + " " + self.Last_name
 
-class Game():
+class Game(object):
     """
     A class for information about a given game in the AUDL
+
+    The score list, stat leaders and goals of a game are only made when
+    they are first used, as most games never need them.
     """
+    __slots__ = ('ID', 'year', 'date', 'game_date', 'time', 'Finished', '_Score', 'Location',
+                 'away_team', 'home_team', '_Home_stats', '_Away_stats', '_Goals', 'Quarter',
+                 'League', 'home_score', 'away_score', 'timestamp', 'status')
+
+    Score = lazy_container('_Score', list)
+    Home_stats = lazy_container('_Home_stats', dict)
+    Away_stats = lazy_container('_Away_stats', dict)
+    Goals = lazy_container('_Goals', dict)
+
     def __init__(self, date, time, year, home_team, away_team):
         # a string containing a has that uniquely identifies a game on the 
         # ultimate numbers server
@@ -702,13 +1205,16 @@ class Game():
         self.year = year
         # a string containing the date of the game
         self.date = date
+        # a date object for the date of the game
+        self.game_date = dt.strptime(date, "%m/%d/%y").date()
         # a string containing a scheduled beginning time of the game
         self.time = time
         # a boolean declaring whether or not a game is over
         self.Finished = False
         # a list containing two tuples. 
         #each tuple contains a team name and their current score
-        self.Score = []
+        # (made when first used)
+        self._Score = None
         # a string containing the location of the game
         self.Location =''
         # a string containing the name of the away_team
@@ -717,43 +1223,102 @@ class Game():
         self.home_team = home_team
         # a dictionary containing the home team's leader in a set of stats for this game
         # Keys: Statistic names Values: Tuple of a player name and their statistic
-        self.Home_stats = {}
+        # (made when first used)
+        self._Home_stats = None
         # a dictionary containing the home team's leader in a set of stats for this game
         # Keys: Statistic names Values: Tuple of a player name and their statistic
-        self.Away_stats = {}
+        # (made when first used)
+        self._Away_stats = None
         # a dictionary containing information about who scored each goal for each point
-        # in the game
-        self.Goals = {}
+        # in the game (made when first used)
+        self._Goals = None
         # an int returning the current quarter 
         self.Quarter = 0
+        # The League class instance whose records are updated when the
+        # game's score changes (if any)
+        self.League = None
+
+    def has_score(self):
+        """
+        Returns whether or not the game has a score yet.
+        """
+        return hasattr(self, 'home_score') and hasattr(self, 'away_score')
+
+    def set_score(self, home_score, away_score):
+        """
+        Sets the game's score. If the score has changed, the game's league
+        is told so that it can update the teams' records.
+        """
+        old_score = (self.home_score, self.away_score) if self.has_score() else None
+        if old_score == (home_score, away_score): return
+        self.home_score = home_score
+        self.away_score = away_score
+        if self.League != None: self.League.score_changed(self, old_score)
 
     def match_game(self, games_dict, home):
-        
-        game_date = dt.strptime(self.date, "%m/%d/%y")
-
-        for game in games_dict:
-            if "timestamp" in game.keys():
-                dict_date = dt.strptime(game['timestamp'][:10], "%Y-%m-%d")
-                tstamp = game['timestamp']
-                new_game = False if hasattr(self,"home_score") or hasattr(self,"away_score") else True
-                higher_score = True if new_game or ((self.home_score+self.away_score)<(game['ours']+game['theirs'])) else False
-                if (game_date.date()-dict_date.date()) == timedelta(days = 0) and (new_game or higher_score):
-                    self.home_score = game['ours'] if home else game['theirs']
-                    self.away_score = game['theirs'] if home else game['ours']
-                    self.timestamp = tstamp
-            else:
-                pass
+        """
+        Finds the game's score in a team's list of games from the
+        ultimate-numbers server.
+
+        games_dict - the team's list of game records
+        home - whether the team is the home team
+        """
+        self.match_records(records_by_date(games_dict).get(self.game_date, []), home)
+
+    def match_records(self, records, home):
+        """
+        Takes the game's score from the highest scoring of a team's game
+        records on the day of the game, if it's higher than the score
+        the game already has.
+
+        records - the team's game records from the day of the game
+        home - whether the team is the home team
+        """
+        if records:
+            # the first record with the highest total, as records come in order
+            game = max(records, key=lambda record: record['ours']+record['theirs'])
+            if not self.has_score() or (self.home_score+self.away_score)<(game['ours']+game['theirs']):
+                if home: self.set_score(game['ours'], game['theirs'])
+                else:    self.set_score(game['theirs'], game['ours'])
+                self.timestamp = game['timestamp']
         self.set_status()
 
-    def set_status(self):
-        
+    def set_status(self, now=None):
+        """
+        Sets the game's status to 1 if its record on the ultimate-numbers
+        server started less than game_length ago, or 0 otherwise.
+        """
         if hasattr(self,'timestamp'):
-            #print self.timestamp
+            if now is None: now = dt.now()
             tstamp = dt.strptime(self.timestamp, "%Y-%m-%d %H:%M")
-            if (dt.today().date()-tstamp.date()) == 0 and (dt.today().time() - tstamp.time()) < 6:
+            if timedelta(0) <= now - tstamp < game_length:
                 self.status=1
             else:
                 self.status=0
         else:
             pass
+
+    def start_time(self):
+        """
+        Returns the scheduled start of the game as a datetime, or None if
+        the game's time can't be read. Times without AM or PM are taken
+        to be in the afternoon or evening.
+        """
+        match = re.match(r"\s*(\d{1,2}):(\d{2})\s*([AaPp][Mm])?", self.time)
+        if match is None: return None
+        hour, minute = int(match.group(1)) % 12, int(match.group(2))
+        if match.group(3) is None or match.group(3).upper() == "PM": hour += 12
+        return dt.combine(self.game_date, dt.min.time()) + timedelta(hours = hour, minutes = minute)
+
+    def in_progress(self, now):
+        """
+        Returns whether the game is being played at a given time, going by
+        its record on the ultimate-numbers server if it has one and by its
+        scheduled start otherwise.
+        """
+        if hasattr(self,'timestamp'):
+            self.set_status(now)
+            return self.status == 1
+        start = self.start_time()
+        return start != None and start <= now < start + game_length
           
@@ -2,10 +2,12 @@
 
 import feedparser as fp
 import youtube as yt
+import threading, time, bisect, email.utils
+from datetime import datetime
 
 class Article():
 
-    def __init__(self, timestamp, url, title, thumb_url = ''):
+    def __init__(self, timestamp, url, title, thumb_url = '', date = None):
 
 
         self.ID = id(self)
@@ -18,29 +20,193 @@ class Article():
 
         self.Thumb_url = thumb_url
 
-class Videos():
+        # A datetime of when the article was published, parsed from the
+        # timestamp unless it is given (datetime.min if it can't be parsed)
+        if date is None: date = parse_date(timestamp)
+        self.Date = date
+
+    def page_info(self):
+        """
+        Returns the article's title, url and the day it was published
+        (e.g. "05 May 2014"), as shown on the news page.
+        """
+        #Only show the date on the app
+        ts = self.Timestamp.encode('ascii', 'ignore')
+        #Join only the day, month, year components
+        ts = " ".join(ts.split(" ")[1:4])
+        return (self.Title, self.url, ts)
+
+def parse_date(timestamp):
+    """
+    Returns a datetime (in UTC) from an RFC 822 timestamp like those in
+    RSS feeds, or datetime.min if it can't be parsed.
+    """
+    parsed = email.utils.parsedate_tz(timestamp)
+    if parsed is None: return datetime.min
+    return datetime.utcfromtimestamp(email.utils.mktime_tz(parsed))
+
+class NewsStore():
+    """
+    Keeps the newest articles from a league's RSS feeds.
+
+    Articles are keyed by their GUID (or link if they don't have one), so
+    fetching a feed again only adds the articles that are new. The store
+    keeps at most max_articles, along with the news page rows of the
+    articles in order of publication, newest first, so the page doesn't
+    have to be sorted when it is asked for.
+    """
+    def __init__(self, max_articles = 100):
+        # The largest number of articles kept. The oldest are dropped.
+        self.max_articles = max_articles
+        # A dictionary of the articles in the store
+        # Keys: GUIDs or links Values: Article class instances
+        self.Articles = {}
+        # A list of (date, count, key) tuples in order of publication.
+        # The count keeps articles published at the same time in the
+        # order they were added.
+        self.Dates = []
+        self.count = 0
+        # The news page rows of the articles, newest first
+        # (see Article.page_info)
+        self.Page = []
+        # A dictionary of the entity tag and modification time each feed
+        # was last sent with. Keys: feed urls Values: (etag, modified) tuples
+        self.Feeds = {}
+
+    def fetch(self, url):
+        """
+        Returns the entries of a feed, or an empty list if the feed hasn't
+        changed since it was last fetched.
+        """
+        etag, modified = self.Feeds.get(url, (None, None))
+        data = fp.parse(url, etag = etag, modified = modified)
+        if data.get('status') == 304: return []
+        self.Feeds[url] = (data.get('etag'), data.get('modified'))
+        return data.entries
+
+    def merge(self, entries):
+        """
+        Adds the feed entries which aren't in the store yet and returns
+        the number added.
+        """
+        added = 0
+        for ent in entries:
+            key = ent.get('id') or ent.link
+            if key in self.Articles: continue
+            article = Article(ent.published, ent.link, ent.title)
+            # when the store is full, anything older than it holds is left out
+            if len(self.Dates) >= self.max_articles and article.Date <= self.Dates[0][0]:
+                continue
+            self.Articles[key] = article
+            self.count += 1
+            bisect.insort(self.Dates, (article.Date, self.count, key))
+            added += 1
+        while len(self.Dates) > self.max_articles:
+            date, count, key = self.Dates.pop(0)
+            del self.Articles[key]
+        if added:
+            self.Page = [self.Articles[key].page_info() for date, count, key in reversed(self.Dates)]
+        return added
+
+class Videos(object):
     """ 
-    will need to update the timestamp each time we update the 
-    videos list in order to compare to the "current" http request
-    time to see if we should refresh the list or just grab the data
-    quickly from our stored list.
+    Keeps the list of videos on the AUDL YouTube channel.
+
+    The list is fetched the first time it is used and kept for ttl seconds.
+    After that, using the list starts a refresh in the background and
+    returns the stale list straight away.
     """
 
-    def __init__(self):
-    	
-    	self.videos = yt.get_youtube()
+    def __init__(self, ttl=60*60, fetch=yt.get_youtube):
+
+        # Number of seconds the list is used for before it is refreshed
+        self.ttl = ttl
+        # The function which fetches the list of videos
+        self.fetch = fetch
+        # A list of (title, url, thumbnail url) tuples, newest first
+        # (None until it is first fetched)
+        self._videos = None
+        # The time the list was last refreshed and the time it last changed
+        # (None until it is first fetched)
+        self.Timestamp = None
+        self.Last_modified = None
+        # Guards the list and whether a refresh is under way
+        self.lock = threading.Lock()
+        self.refreshing = False
+        # Held while the list is fetched, so only one fetch runs at a time
+        self.fetch_lock = threading.Lock()
 
         self.ID = id(self)
-        
-        #self.Timestamp = timestamp
 
+    def get_videos(self):
+        if self._videos is None:
+            self.refresh()
+        elif self.stale():
+            self.refresh_in_background()
+        return self._videos
 
-    def refresh(self):
-    	'''
-    	used to refresh videos when needed!
-    	'''
-    	self.videos = yt.get_youtube()
-
+    def set_videos(self, videos):
+        self._videos = videos
+        self.Timestamp = self.Last_modified = time.time()
 
+    videos = property(get_videos, set_videos)
 
+    def stale(self):
+        """
+        Returns whether the list is older than ttl seconds.
+        """
+        return self.Timestamp is None or time.time() - self.Timestamp >= self.ttl
 
+    def refresh(self):
+        '''
+        used to refresh videos when needed! Returns whether the list changed.
+
+        A refresh which finds no videos is taken to have failed, so a
+        list which was found before is kept.
+
+        Only one fetch runs at a time. A refresh called while another
+        (such as a background one) is fetching waits for it and uses its
+        list rather than fetching again.
+        '''
+        requested = time.time()
+        with self.fetch_lock:
+            if self.Timestamp is not None and self.Timestamp >= requested:
+                # refreshed while we waited
+                return self.Last_modified >= requested
+            videos = self.fetch()
+            with self.lock:
+                self.Timestamp = time.time()
+                if self._videos is not None and (not videos or videos == self._videos):
+                    return False
+                self.videos = videos
+            return True
+
+    def refresh_in_background(self):
+        """
+        Starts a refresh on another thread unless one is under way.
+        """
+        with self.lock:
+            if self.refreshing: return
+            self.refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self.refreshing = False
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+
+    def __getstate__(self):
+        # the locks can't be saved, and a refresh under way isn't
+        state = self.__dict__.copy()
+        del state['lock']
+        del state['fetch_lock']
+        state['refreshing'] = False
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+        self.fetch_lock = threading.Lock()
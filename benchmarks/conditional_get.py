@@ -0,0 +1,69 @@
+#!/usr/bin/python
+
+"""
+Polls the pages the app refreshes most often (/Home, /Scores and
+/Standings) the way a client without validators does and the way a client
+sending If-None-Match does, and reports the bytes received and the CPU time
+used by each.
+
+The server runs in this process, so the CPU time covers both the client
+and the server side of each request.
+
+Run from the top directory of the repository:
+
+python benchmarks/conditional_get.py [polls]
+"""
+
+import sys, os, time, threading, httplib, SocketServer
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import server
+
+# number of times each page is polled
+POLLS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+PATHS = ["/Home", "/Scores", "/Standings"]
+
+def poll(port, path, n, conditional):
+    """
+    Requests path n times and returns the bytes received (status line,
+    headers and body) and the CPU time used.
+    """
+    headers = {}
+    received = 0
+    start = sum(os.times()[:2])
+    for i in range(n):
+        conn = httplib.HTTPConnection("127.0.0.1", port)
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        body = response.read()
+        received += len(body) + len(str(response.msg)) + len("HTTP/1.0 200 OK\r\n")
+        if conditional: headers['If-None-Match'] = response.getheader('ETag')
+        conn.close()
+    return received, sum(os.times()[:2]) - start
+
+def main():
+
+    server.start_league()
+
+    class QuietHandler(server.Handler):
+        def log_message(self, format, *args): pass
+
+    httpd = SocketServer.ThreadingTCPServer(("127.0.0.1", 0), QuietHandler)
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    port = httpd.server_address[1]
+
+    print "%-12s %14s %14s %10s %10s %8s %8s" % ("page", "full bytes", "cond. bytes", "full cpu",
+                                                 "cond. cpu", "bytes", "cpu")
+    for path in PATHS:
+        full = poll(port, path, POLLS, False)
+        cond = poll(port, path, POLLS, True)
+        print "%-12s %14d %14d %9.3fs %9.3fs %7.1f%% %7.1f%%" % (path, full[0], cond[0], full[1], cond[1],
+                                                              100.*(full[0]-cond[0])/full[0],
+                                                              100.*(full[1]-cond[1])/full[1])
+    httpd.shutdown()
+
+if __name__ == "__main__":
+    main()
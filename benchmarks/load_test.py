@@ -0,0 +1,120 @@
+#!/usr/bin/python
+
+"""
+Compares the threaded, event loop and prefork servers under many clients
+polling /Home at once over kept-alive connections, and reports the
+requests per second and the median and 99th percentile latency of each.
+For the prefork server it also reports the memory used by each worker.
+
+Each server runs in its own processes so that the clients don't compete
+with it for the interpreter lock.
+
+Run from the top directory of the repository:
+
+python benchmarks/load_test.py [clients] [requests per client] [workers]
+"""
+
+import sys, os, time, threading, httplib, multiprocessing, tempfile, signal
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import server
+
+# number of clients connected at once and the requests each makes
+CLIENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+REQUESTS = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+# number of worker processes for the prefork server
+WORKERS = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+PATH = "/Home"
+
+def serve(mode, ready):
+    """
+    Runs a server in mode on a free port and sends its port to ready.
+    """
+    server.Handler.log_message = lambda self, format, *args: None
+    httpd = server.make_server(mode, ("127.0.0.1", 0), CLIENTS)
+    ready.send(httpd.server_address[1])
+    httpd.serve_forever()
+
+def resident_kb(pid):
+    """
+    Returns the resident memory of a process in kB (Linux only).
+    """
+    with open("/proc/%d/status" % pid) as f:
+        for line in f:
+            if line.startswith("VmRSS:"): return int(line.split()[1])
+
+def client(port, latencies, errors, start):
+    """
+    Makes REQUESTS requests over one connection, recording the latency of each.
+    """
+    start.wait()
+    conn = httplib.HTTPConnection("127.0.0.1", port, timeout=30)
+    for i in range(REQUESTS):
+        begin = time.time()
+        try:
+            conn.request("GET", PATH, headers={'Accept-Encoding': 'gzip'})
+            conn.getresponse().read()
+        except (httplib.HTTPException, IOError):
+            errors.append(1)
+            conn.close()
+            conn = httplib.HTTPConnection("127.0.0.1", port, timeout=30)
+            continue
+        latencies.append(time.time() - begin)
+    conn.close()
+
+def percentile(values, fraction):
+    return values[min(len(values)-1, int(fraction*len(values)))]
+
+def run(mode):
+    """
+    Puts a server in mode under load and returns the requests per second,
+    median and 99th percentile latency (in ms) and the number of errors.
+    """
+    if mode == "prefork":
+        path = tempfile.mktemp()
+        server.write_snapshot(server.snapshot, path)
+        listener = server.make_listener(("127.0.0.1", 0))
+        port = listener.getsockname()[1]
+        pids = server.start_workers(listener, WORKERS, path, CLIENTS)
+    else:
+        receive, send = multiprocessing.Pipe(False)
+        process = multiprocessing.Process(target=serve, args=(mode, send))
+        process.start()
+        port = receive.recv()
+
+    latencies, errors = [], []
+    start = threading.Event()
+    threads = [threading.Thread(target=client, args=(port, latencies, errors, start)) for i in range(CLIENTS)]
+    for thread in threads: thread.start()
+    begin = time.time()
+    start.set()
+    for thread in threads: thread.join()
+    elapsed = time.time() - begin
+    if mode == "prefork":
+        if os.path.exists("/proc"):
+            print "prefork worker memory (kB):", [resident_kb(pid) for pid in pids]
+        for pid in pids:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+        listener.close()
+        os.remove(path)
+    else:
+        process.terminate()
+        process.join()
+
+    latencies.sort()
+    return (len(latencies)/elapsed, 1000*percentile(latencies, 0.5),
+            1000*percentile(latencies, 0.99), len(errors))
+
+def main():
+
+    server.start_league()
+    print "%d clients making %d requests each for %s" % (CLIENTS, REQUESTS, PATH)
+    results = [(mode, run(mode)) for mode in ["threaded", "event", "prefork"]]
+    print "%-10s %10s %10s %10s %8s" % ("mode", "req/s", "p50 (ms)", "p99 (ms)", "errors")
+    for mode, result in results:
+        print "%-10s %10.1f %10.2f %10.2f %8d" % ((mode,) + result)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/python
+
+"""
+Reports the bytes used by each Player and each Game, and by the players
+and games of a full season, with the current classes and with the
+previous classes (old-style instances with a dictionary of attributes
+and every container made up front).
+
+Only the objects and containers belonging to each instance are counted,
+not the strings and numbers they share with the rest of the league.
+
+Run from the top directory of the repository:
+
+python benchmarks/model_memory.py
+"""
+
+import sys, os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import AUDLclasses
+from datetime import datetime as dt
+
+class OldPlayer():
+    """
+    The previous version of AUDLclasses.Player, kept for comparison.
+    """
+    def __init__(self,first_name,last_name,number):
+        self.Stats = {}
+        self.First_name = first_name
+        self.Last_name = last_name
+        self.Number = number
+        self.Height = ''
+        self.Weight = ''
+        self.Age = 0
+
+class OldGame():
+    """
+    The previous version of AUDLclasses.Game, kept for comparison.
+    """
+    def __init__(self, date, time, year, home_team, away_team):
+        self.ID = ''
+        self.year = year
+        self.date = date
+        self.game_date = dt.strptime(date, "%m/%d/%y").date()
+        self.time = time
+        self.Finished = False
+        self.Score = []
+        self.Location =''
+        self.away_team = away_team
+        self.home_team = home_team
+        self.Home_stats = {}
+        self.Away_stats = {}
+        self.Goals = {}
+        self.Quarter = 0
+        self.League = None
+
+def own_size(obj):
+    """
+    Returns the bytes used by an object, its attribute dictionary (if it
+    has one) and the containers held in its attributes.
+    """
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+        values = obj.__dict__.values()
+    else:
+        values = [getattr(obj, slot) for slot in obj.__slots__ if hasattr(obj, slot)]
+    for value in values:
+        if isinstance(value, (list, dict, set)): size += sys.getsizeof(value)
+    return size
+
+def season(player_class, game_class):
+    """
+    Makes the players and games of the 2014 season with the given classes.
+    """
+    players = [player_class(fn, ln, num) for team in AUDLclasses.read_players('2014_players.json').values()
+               for fn, ln, num in team]
+    games = [game_class(*game[:5]) for team in AUDLclasses.read_schedule('2014_AUDL_Schedule.json').values()
+             for game in team]
+    for player in players:
+        for stat in AUDLclasses.player_stats: player.Stats[stat] = 0
+    return players, games
+
+def main():
+
+    print "%-8s %14s %14s %16s %16s" % ("", "player bytes", "game bytes", "season players", "season games")
+    for name, classes in [("before", (OldPlayer, OldGame)), ("after", (AUDLclasses.Player, AUDLclasses.Game))]:
+        players, games = season(*classes)
+        player_bytes = sum(own_size(player) for player in players)
+        game_bytes = sum(own_size(game) for game in games)
+        print "%-8s %14.0f %14.0f %16d %16d" % (name, float(player_bytes)/len(players), float(game_bytes)/len(games),
+                                               player_bytes, game_bytes)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/python
+
+"""
+Measures the pages which resolve team names to IDs (League.return_schedules,
+League.return_scores_page and Team.return_schedule) using the league's
+name index and using the linear scan League.name_to_id used to do.
+
+Run from the top directory of the repository:
+
+python benchmarks/name_lookup.py [repeats]
+"""
+
+import sys, os, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import AUDLclasses
+
+# number of times each page is built
+REPEATS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+def scan_name_to_id(league, name):
+    """
+    The previous version of League.name_to_id, kept for comparison.
+    """
+    if name == "Montreal Royal": return 1234
+    for ID, team_inst in league.Teams.items():
+        AUDL_name = team_inst.City + " " + team_inst.Name
+        if AUDL_name in name.rstrip(): return ID
+    return 0
+
+def build_league():
+    """
+    Builds a league and its schedule from the local files.
+    """
+    league = AUDLclasses.League()
+    league.add_teams('Teams_Info', games=False, players=False, stats=False)
+    for ID, team in league.Teams.items():
+        team.add_games()
+    return league
+
+def time_page(func, n=REPEATS):
+    """
+    Returns the mean time (in ms) to build a page.
+    """
+    start = time.time()
+    for i in range(n): func()
+    return (time.time()-start)*1000./n
+
+def main():
+
+    league = build_league()
+    team = league.Teams.values()[0]
+    pages = [ ("return_schedules", league.return_schedules),
+              ("return_scores_page", league.return_scores_page),
+              ("Team.return_schedule", team.return_schedule) ]
+
+    print "%-22s %12s %12s" % ("page", "scan", "index")
+    for name, page in pages:
+        league.name_to_id = lambda name: scan_name_to_id(league, name)
+        scan = time_page(page)
+        del league.name_to_id
+        index = time_page(page)
+        print "%-22s %10.3fms %10.3fms" % (name, scan, index)
+
+if __name__ == "__main__":
+    main()
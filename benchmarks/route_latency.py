@@ -0,0 +1,111 @@
+#!/usr/bin/python
+
+"""
+Measures the latency of each server route as served by server.path_data.
+
+The "before" numbers emulate the old path_data, which built every main
+page of the app before looking at the requested path. The "after" numbers
+use the current route table, which only builds the page that was asked for.
+
+Each route is first requested SAMPLES times back to back, and the mean
+and 99th percentile time to build it are reported. Then the current route
+is driven at a fixed RATE requests per second on a single thread: the
+requests are due at even intervals, and each one's latency is counted from
+when it was due, so time spent queued behind earlier requests is included.
+The 99th percentile of that latency, and whether the route kept up with
+the rate, are reported too.
+
+Run from the top directory of the repository:
+
+python benchmarks/route_latency.py [samples]
+"""
+
+import sys, os, json, time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import AUDLclasses
+import server
+
+# requests per second we would like each route to sustain
+RATE = 1000
+# number of requests timed for each route
+SAMPLES = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+def eager_path_data(path, League):
+    """
+    The previous version of server.path_data, kept for comparison. Every
+    main page is built on every request.
+    """
+    pages = dict((name, route(League)) for name, route in server.main_pages.items())
+    path_ents = server.path_parse(path)
+    if len(path_ents) == 1 and path_ents[0] in pages:
+        return json.dumps(pages[path_ents[0]])
+    return server.path_data(path, League)
+
+def build_league():
+    """
+    Builds a league from the local team, schedule and player files
+    along with the current news feed.
+    """
+    league = AUDLclasses.League()
+    league.add_teams('Teams_Info', games=False, stats=False)
+    league.get_news()
+    for ID, team in league.Teams.items():
+        team.add_games()
+        team.populate_team_stats()
+    return league
+
+def time_route(func, path, league, n=SAMPLES):
+    """
+    Returns the mean and 99th percentile latency (in ms) of n requests
+    for path.
+    """
+    samples = []
+    for i in range(n):
+        start = time.time()
+        func(path, league)
+        samples.append((time.time()-start)*1000.)
+    samples.sort()
+    return sum(samples)/n, samples[int(n*0.99)-1]
+
+def time_route_at_rate(func, path, league, rate=RATE, n=SAMPLES):
+    """
+    Requests path n times, one every 1/rate seconds, and returns the 99th
+    percentile latency (in ms) counted from when each request was due, and
+    whether the requests kept up with the rate.
+    """
+    interval = 1./rate
+    samples = []
+    begin = time.time()
+    for i in range(n):
+        due = begin + i*interval
+        # spin rather than sleep, as a sleep can overshoot by more than
+        # the interval and would be counted against the route
+        while time.time() < due: pass
+        func(path, league)
+        samples.append((time.time()-due)*1000.)
+    elapsed = time.time() - begin
+    samples.sort()
+    # the last request should finish within an interval of the last due time
+    return samples[int(n*0.99)-1], elapsed <= n*interval + interval
+
+def main():
+
+    league = build_league()
+    paths = ["/"+page for page in sorted(server.main_pages)]
+    paths += ["/Teams/"+str(ID) for ID in sorted(league.Teams)[:3]]
+
+    print "%-20s %12s %12s %12s %12s %14s %6s" % ("route", "before mean", "before p99",
+                                                  "after mean", "after p99",
+                                                  "p99 @%dr/s" % RATE, "kept up")
+    for path in paths:
+        before = time_route(eager_path_data, path, league)
+        after = time_route(server.path_data, path, league)
+        loaded, kept_up = time_route_at_rate(server.path_data, path, league)
+        print "%-20s %10.3fms %10.3fms %10.3fms %10.3fms %12.3fms %6s" % (path, before[0], before[1],
+                                                                           after[0], after[1], loaded,
+                                                                           "yes" if kept_up else "no")
+
+if __name__ == "__main__":
+    main()
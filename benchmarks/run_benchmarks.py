@@ -0,0 +1,171 @@
+#!/usr/bin/python
+
+"""
+Times the league's loading, refreshing and pages, and every server route,
+on synthetic seasons of growing size (see synthetic.py), and writes the
+results to a json file so that runs on different commits can be compared.
+
+For each number of teams the season has games_per_team games a team and
+players players a team. Each benchmark is run repeats times and its
+fastest, median and mean times are kept. The medians are printed as a
+table with a column for each size, which shows how each one scales.
+
+Run from the top directory of the repository:
+
+python benchmarks/run_benchmarks.py [--teams 8,16,32,64] [--games-per-team 14]
+    [--players 24] [--repeats 20] [--output benchmark_results.json]
+    [--compare old_results.json]
+
+With --compare, the medians are also shown as a ratio of the medians in
+an earlier results file (above 1 is slower).
+"""
+
+import sys, os, json, time, tempfile, shutil, platform, subprocess, argparse
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+top = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+import AUDLclasses
+import statsapi
+import server
+import synthetic
+
+def time_calls(func, repeats):
+    """
+    Calls func repeats times and returns the fastest, median and mean
+    time of a call in ms.
+    """
+    samples = []
+    for i in range(repeats):
+        start = time.time()
+        func()
+        samples.append((time.time()-start)*1000.)
+    samples.sort()
+    return samples[0], samples[len(samples)/2], sum(samples)/len(samples)
+
+def league_benchmarks(league, season):
+    """
+    Returns a list of (name, function) pairs for the benchmarks of a league.
+    """
+    teams = league.Teams.values()
+
+    def add_teams():
+        statsapi.client = synthetic.PayloadClient(season.payloads)
+        AUDLclasses.League().add_teams(synthetic.teams_file)
+
+    def update_games(changed):
+        client = synthetic.PayloadClient(season.payloads, changed)
+        def update():
+            statsapi.client = client
+            league.update_games()
+        return update
+
+    benchmarks = [("League.add_teams", add_teams),
+                  ("League.update_games (new data)", update_games(True)),
+                  ("League.update_games (unchanged)", update_games(False)),
+                  ("League.standings", league.standings),
+                  ("League.return_scores_page", league.return_scores_page),
+                  ("League.return_schedules", league.return_schedules),
+                  ("League.get_top_fives", league.get_top_fives),
+                  ("Team.return_schedule (every team)", lambda: [team.return_schedule() for team in teams]),
+                  ("Team.roster (every team)", lambda: [team.roster() for team in teams])]
+    # every route the server builds with path_data
+    paths = ["/" + page for page in sorted(server.main_pages)]
+    paths.append("/Teams/%d" % sorted(league.Teams)[0])
+    for path in paths:
+        benchmarks.append(("path_data " + path, lambda path=path: server.path_data(path, league)))
+    return benchmarks
+
+def git_commit():
+    """
+    Returns the commit the tree is at, or None if it can't be found.
+    """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=top).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(sizes, games_per_team, players, repeats):
+    """
+    Runs every benchmark on a season for each number of teams in sizes and
+    returns a list of the results.
+    """
+    results = []
+    client = statsapi.client
+    cwd = os.getcwd()
+    for teams in sizes:
+        games = teams * games_per_team / 2
+        season = synthetic.Season(teams, games, players)
+        directory = tempfile.mkdtemp()
+        try:
+            league = synthetic.build_league(season, directory)
+            for name, func in league_benchmarks(league, season):
+                fastest, median, mean = time_calls(func, repeats)
+                results.append({ 'benchmark': name, 'teams': teams, 'games': games,
+                                 'players': players*teams, 'repeats': repeats,
+                                 'min_ms': fastest, 'median_ms': median, 'mean_ms': mean })
+                print >> sys.stderr, "%4d teams  %-36s %10.3f ms" % (teams, name, median)
+        finally:
+            os.chdir(cwd)
+            statsapi.client = client
+            shutil.rmtree(directory)
+    return results
+
+def report(results, sizes, baseline=None):
+    """
+    Prints the median time of each benchmark at each size, and its ratio
+    to the baseline's median if there is one.
+    """
+    medians = dict(((result['benchmark'], result['teams']), result['median_ms']) for result in results)
+    names = []
+    for result in results:
+        if result['benchmark'] not in names: names.append(result['benchmark'])
+
+    print "median ms by number of teams" + (" (ratio to baseline)" if baseline else "")
+    print "%-36s" % "benchmark" + "".join("%18d" % teams for teams in sizes)
+    for name in names:
+        line = "%-36s" % name
+        for teams in sizes:
+            median = medians.get((name, teams))
+            cell = "-" if median is None else "%.3f" % median
+            old = baseline.get((name, teams)) if baseline else None
+            if median is not None and old:
+                cell += " (%.2f)" % (median/old)
+            line += "%18s" % cell
+        print line
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Benchmarks the league and server on synthetic seasons.")
+    parser.add_argument("--teams", default="8,16,32,64",
+                        help="comma separated numbers of teams to run at")
+    parser.add_argument("--games-per-team", type=int, default=14)
+    parser.add_argument("--players", type=int, default=24, help="players on each team")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="the file the results are written to")
+    parser.add_argument("--compare", help="an earlier results file to compare with")
+    args = parser.parse_args(argv)
+    sizes = [int(teams) for teams in args.teams.split(",")]
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = dict(((result['benchmark'], result['teams']), result['median_ms'])
+                            for result in json.load(f)['results'])
+
+    results = run(sizes, args.games_per_team, args.players, args.repeats)
+    report(results, sizes, baseline)
+
+    with open(args.output, 'w') as f:
+        json.dump({ 'commit': git_commit(),
+                    'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    'settings': { 'teams': sizes, 'games_per_team': args.games_per_team,
+                                  'players': args.players, 'repeats': args.repeats },
+                    'results': results }, f, indent=2, sort_keys=True)
+    print "results written to", args.output
+
+if __name__ == "__main__":
+    main()
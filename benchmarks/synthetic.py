@@ -0,0 +1,205 @@
+#!/usr/bin/python
+
+"""
+Makes synthetic seasons for the benchmarks: any number of teams, games
+and players, in the formats of Teams_Info, 2014_AUDL_Schedule.json and
+2014_players.json, along with the data the ultimate-numbers server would
+send for each team and a news feed and video list.
+
+A season is made from a seed, so the same arguments always give the same
+season.
+
+Build a league from one with:
+
+season = synthetic.Season(teams=32, games=256, players=24)
+league = synthetic.build_league(season, directory)
+"""
+
+import sys, os, json, random
+from datetime import date, timedelta
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import AUDLclasses
+import statsapi
+
+# The day the synthetic seasons start on
+season_start = date(2014, 4, 12)
+divisions = ["Eastern", "Midwestern", "Western", "Southern"]
+# The files add_teams and the teams read, in the directory they are written to
+teams_file = "Teams_Info"
+schedule_file = "2014_AUDL_Schedule.json"
+players_file = "2014_players.json"
+
+class Entry(dict):
+    """
+    A news feed entry, which (like feedparser's) can be read by key
+    or attribute.
+    """
+    __getattr__ = dict.__getitem__
+
+class Season():
+    """
+    A synthetic season.
+
+    teams - the number of teams
+    games - the number of games in the season. Teams play in rounds in
+            which every team plays at most once, one round a day.
+    players - the number of players on each team
+    articles, videos - the number of news articles and videos
+    """
+    def __init__(self, teams=8, games=56, players=24, articles=20, videos=50, seed=0):
+        self.random = random.Random(seed)
+        # A list of (ID, name, division, city) tuples for each team
+        self.teams = [(5000000000000000 + n, "Team%d" % n, divisions[n % len(divisions)], "City%d" % n)
+                      for n in range(teams)]
+        # A list of (date, home team, away team) tuples, in date order
+        self.games = self.make_games(games)
+        # A dictionary of the teams' players
+        # Keys: team IDs Values: lists of (first name, last name, number) tuples
+        self.players = dict((team[0], [("First%d" % n, "Last%d" % n, n) for n in range(players)])
+                            for team in self.teams)
+        # A dictionary of the ultimate-numbers data for each request path
+        # Keys: request paths Values: python objects
+        self.payloads = self.make_payloads()
+        # The news feed entries and the list of videos, newest first
+        self.articles = [Entry(id="http://news/%d" % n, link="http://news/%d" % n,
+                               title="Article %d" % n,
+                               published=(season_start + timedelta(days = n)).strftime("%a, %d %b %Y 10:00:00 GMT"))
+                         for n in range(articles)]
+        self.videos = [("Video %d" % n, "http://www.youtube.com/watch?v=%011d&feature=youtube_gdata" % n,
+                        "http://i.ytimg.com/vi/%011d/0.jpg" % n)
+                       for n in range(videos, 0, -1)]
+
+    def full_name(self, team):
+        return team[3] + " " + team[1]
+
+    def make_games(self, count):
+        """
+        Pairs the teams off a round at a time (the circle method), so that
+        every team plays every other before any pair meets again.
+        """
+        teams = list(self.teams)
+        if len(teams) % 2: teams.append(None)
+        games = []
+        day = season_start
+        while len(games) < count and len(self.teams) > 1:
+            half = len(teams) / 2
+            for home, away in zip(teams[:half], reversed(teams[half:])):
+                if home is None or away is None or len(games) == count: continue
+                # alternate which team is at home
+                if len(games) % 2: home, away = away, home
+                games.append((day, home, away))
+            teams = [teams[0], teams[-1]] + teams[1:-1]
+            day += timedelta(days = 1)
+        return games
+
+    def schedule(self):
+        """
+        Returns the season's schedule in the format of 2014_AUDL_Schedule.json,
+        which lists each game once for each team.
+        """
+        rows = []
+        for day, home, away in self.games:
+            for team, opponent, side in ((home, away, "Home"), (away, home, "Away")):
+                rows.append({ "Year": day.year,
+                              "team": self.full_name(team) + " ",
+                              "date": "%d/%d/%s" % (day.month, day.day, day.strftime("%y")),
+                              "time": "7:30 PM EST",
+                              "home/away": side,
+                              "opponent": self.full_name(opponent) })
+        return rows
+
+    def roster(self):
+        """
+        Returns the season's players in the format of 2014_players.json.
+        """
+        return [{ "Team": self.full_name(team),
+                  "Jersey #": number,
+                  "Player First Name": first + " ",
+                  "Player Last Name": last }
+                for team in self.teams for first, last, number in self.players[team[0]]]
+
+    def make_payloads(self):
+        """
+        Makes each team's game records, player list and player stats as
+        the ultimate-numbers server sends them.
+        """
+        payloads = {}
+        for team in self.teams:
+            payloads["/team/%d/games" % team[0]] = []
+            payloads["/team/%d/players/" % team[0]] = [
+                { "name": "%s %s" % (first, last[0]), "number": str(number) }
+                for first, last, number in self.players[team[0]]]
+            payloads["/team/%d/stats/player" % team[0]] = [
+                dict([("playerName", "%s %s" % (first, last[0]))] +
+                     [(stat, self.random.randint(0, 40)) for stat in AUDLclasses.player_stats])
+                for first, last, number in self.players[team[0]]]
+        for day, home, away in self.games:
+            home_score, away_score = self.random.randint(10, 25), self.random.randint(10, 25)
+            # games aren't tied
+            if home_score == away_score: home_score += 1
+            timestamp = day.strftime("%Y-%m-%d") + " 19:30"
+            for team, opponent, ours, theirs in ((home, away, home_score, away_score),
+                                                 (away, home, away_score, home_score)):
+                payloads["/team/%d/games" % team[0]].append(
+                    { "timestamp": timestamp, "opponentName": opponent[1],
+                      "ours": ours, "theirs": theirs })
+        return payloads
+
+    def write(self, directory):
+        """
+        Writes the season's team, schedule and player files to directory.
+        """
+        with open(os.path.join(directory, teams_file), 'w') as f:
+            for ID, name, division, city in self.teams:
+                f.write("--------------------------\n")
+                f.write("ID: %d\nTEAM_NAME: %s\nDIV: %s\nCITY: %s\n" % (ID, name, division, city))
+                f.write("--------------------------\n\n")
+        with open(os.path.join(directory, schedule_file), 'w') as f:
+            json.dump(self.schedule(), f, indent=2)
+        with open(os.path.join(directory, players_file), 'w') as f:
+            json.dump(self.roster(), f, indent=2)
+
+class PayloadClient():
+    """
+    Stands in for statsapi.client, answering requests from a season's
+    payloads without a network.
+
+    changed - whether each request returns newly decoded data (as when
+              the server's data has changed) or the same objects every
+              time (as statsapi does when it hasn't)
+    """
+    def __init__(self, payloads, changed=True):
+        # A dictionary of the json encoded data for each request path
+        self.bodies = dict((path, json.dumps(data)) for path, data in payloads.items())
+        self.changed = changed
+        # The decoded data last returned for each path
+        self.data = {}
+        self.requests = 0
+
+    def get_json(self, path):
+        self.requests += 1
+        if self.changed or path not in self.data:
+            self.data[path] = json.loads(self.bodies.get(path, "[]"))
+        return self.data[path]
+
+    def close(self):
+        pass
+
+def build_league(season, directory):
+    """
+    Writes a season's files to directory and builds a league from them,
+    with statsapi.client answering from the season's payloads. The news
+    and videos are set from the season rather than fetched.
+
+    The league's teams read their files from the working directory, so
+    it is changed to directory.
+    """
+    season.write(directory)
+    os.chdir(directory)
+    statsapi.client = PayloadClient(season.payloads)
+    league = AUDLclasses.League()
+    league.add_teams(teams_file)
+    league.News_store.merge(season.articles)
+    league.Videos.videos = list(season.videos)
+    return league
@@ -0,0 +1,187 @@
+#!/usr/bin/python
+
+"""
+An event loop front end for the app server.
+
+One thread serves every connection using asyncore, where the threaded
+server (SocketServer.ThreadingTCPServer) starts a thread for each one.
+Connections are kept alive between requests, pipelined requests are
+answered in the order they arrive and the number of open connections is
+limited. Responses are made by server.respond, so the pages and headers
+are the same as the threaded server's.
+"""
+
+import asyncore, asynchat, socket, time, threading, email.utils, traceback
+import mimetools, StringIO, BaseHTTPServer
+
+# The largest request line and headers accepted, in bytes
+max_request_size = 16*1024
+
+# The reason phrase for each status code
+reasons = dict((code, text[0]) for code, text in BaseHTTPServer.BaseHTTPRequestHandler.responses.items())
+
+class HTTPChannel(asynchat.async_chat):
+    """
+    A connection to the event server. Each request is answered as soon
+    as its headers have arrived.
+    """
+    def __init__(self, sock, server):
+        asynchat.async_chat.__init__(self, sock, server.map)
+        # The EventServer the connection was accepted by
+        self.server = server
+        # The pieces of the request read so far and their total length
+        self.data = []
+        self.size = 0
+        # The time of the last request on the connection
+        self.last_active = time.time()
+        # Whether the connection closes once the response is sent
+        self.closing = False
+        self.set_terminator("\r\n\r\n")
+
+    def collect_incoming_data(self, data):
+        if self.closing: return
+        self.data.append(data)
+        self.size += len(data)
+        if self.size > max_request_size:
+            self.reply(400, [], "Request headers too large", False)
+
+    def found_terminator(self):
+        if self.closing: return
+        request = "".join(self.data).lstrip("\r\n")
+        self.data = []
+        self.size = 0
+        self.last_active = time.time()
+
+        lines = request.split("\r\n")
+        words = lines[0].split()
+        if len(words) != 3 or not words[2].startswith("HTTP/"):
+            self.reply(400, [], "Bad request", False)
+            return
+        method, path, version = words
+        headers = mimetools.Message(StringIO.StringIO("\r\n".join(lines[1:]) + "\r\n\r\n"))
+
+        connection = headers.get('Connection', '').lower()
+        if version == "HTTP/1.0": keep_alive = connection == "keep-alive"
+        else: keep_alive = connection != "close"
+
+        # requests with a body can't be read, so the connection can't be kept
+        if method != "GET" or headers.get('Content-Length', '0') != '0':
+            self.reply(501, [], "Only GET requests are supported", False)
+            return
+
+        status, response_headers, body = self.server.respond(path, headers)
+        self.reply(status, response_headers, body, keep_alive)
+
+    def reply(self, status, headers, body, keep_alive):
+        """
+        Queues a response. The connection is closed after sending it
+        unless keep_alive is true.
+        """
+        lines = ["HTTP/1.1 %d %s" % (status, reasons.get(status, "")),
+                 "Server: AUDL",
+                 "Date: " + email.utils.formatdate(usegmt=True)]
+        lines.extend("%s: %s" % header for header in headers)
+        if status >= 400 and not headers:
+            lines.append("Content-Type: text/plain")
+            lines.append("Content-Length: %d" % len(body))
+        if not keep_alive: lines.append("Connection: close")
+        self.push("\r\n".join(lines) + "\r\n\r\n")
+        # the body may be a buffer, which is sent without copying it
+        if body: self.push(body)
+        if not keep_alive:
+            self.closing = True
+            self.close_when_done()
+
+    def handle_error(self):
+        # a bug in making a response shouldn't go unnoticed
+        traceback.print_exc()
+        self.close()
+
+    def close(self):
+        asynchat.async_chat.close(self)
+        self.server.channels.discard(self)
+
+class EventServer(asyncore.dispatcher):
+    """
+    Accepts connections to the app and serves them from a single thread.
+
+    If a listening socket is given, connections are accepted from it rather
+    than a new socket bound to address. Several processes can share one.
+    """
+    def __init__(self, address, respond, max_connections=1000, keep_alive_timeout=15, sock=None):
+        # The sockets served by the server's event loop
+        self.map = {}
+        asyncore.dispatcher.__init__(self, map=self.map)
+        # The function which makes the response to a request
+        # (see server.respond)
+        self.respond = respond
+        # The largest number of connections open at once. Connections
+        # past this wait to be accepted.
+        self.max_connections = max_connections
+        # Number of seconds an idle connection is kept open
+        self.keep_alive_timeout = keep_alive_timeout
+        # The open connections
+        self.channels = set()
+        # Set while the event loop should keep running, and once it has stopped
+        self.stopping = False
+        self.stopped = threading.Event()
+        self.stopped.set()
+
+        if sock is None:
+            self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.set_reuse_addr()
+            self.bind(address)
+            self.listen(socket.SOMAXCONN)
+        else:
+            sock.setblocking(0)
+            self.set_socket(sock, self.map)
+            self.accepting = True
+        self.server_address = self.socket.getsockname()
+
+    def readable(self):
+        return len(self.channels) < self.max_connections
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is None: return
+        self.channels.add(HTTPChannel(pair[0], self))
+
+    def handle_error(self):
+        # a failed accept doesn't stop the server
+        pass
+
+    def close_idle(self):
+        """
+        Closes connections which haven't made a request in keep_alive_timeout
+        seconds and have nothing left to send.
+        """
+        now = time.time()
+        for channel in list(self.channels):
+            if now - channel.last_active > self.keep_alive_timeout and not channel.producer_fifo:
+                channel.close()
+
+    def serve_forever(self, poll_interval=0.5):
+        """
+        Runs the event loop until shutdown is called.
+        """
+        self.stopping = False
+        self.stopped.clear()
+        try:
+            while not self.stopping:
+                # poll rather than select, which can't watch sockets
+                # numbered 1024 or higher
+                asyncore.loop(timeout=poll_interval, map=self.map, count=1, use_poll=True)
+                self.close_idle()
+        finally:
+            self.stopped.set()
+
+    def shutdown(self):
+        """
+        Stops the event loop from another thread and waits for it to finish.
+        """
+        self.stopping = True
+        self.stopped.wait()
+
+    def server_close(self):
+        for channel in list(self.channels): channel.close()
+        self.close()
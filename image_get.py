@@ -1,29 +1,100 @@
-#!/usr/bin/python 
+#!/usr/bin/python
+
+import os, time, hashlib
+
+icon_dict = { 'AlleyCats' : "team_alleycats_on.png",
+              'Breeze' : "team_breeze_on.png",
+              'Dragons' : "team_dragons_on.png",
+              'Empire' : "team_empire_on.png",
+              'FlameThrowers' : "team_flamethrowers_on.png",
+              'Lions' : "team_lions_on.png",
+              'Mechanix' : "team_mechanix_on.png",
+              'Phoenix' : "team_phoenix_on.png",
+              'Radicals' : "team_radicals_on.png",
+              'Raptors' : "team_raptors_on.png",
+              'Revolution' : "team_revolution_on.png",
+              'Riptide' : "team_riptide_on.png",
+              'Royal' : "team_royal_on.png",
+              'Rush' : "team_rush_on.png",
+              'Spiders' : "team_spiders_on.png",
+              'Wildfire' : "team_wildfire_on.png",
+              'Wind Chill' : "team_windchill_on.png"
+            }
+
+def logo_file(team_name):
+    """
+    Returns the name of the logo file for a team. Teams not in icon_dict
+    are expected to follow the same naming as the others.
+    """
+    if team_name in icon_dict: return icon_dict[team_name]
+    return "team_" + team_name.lower().replace(" ", "") + "_on.png"
+
+class Logo():
+    """
+    The contents of a logo file along with an entity tag for it.
+    """
+    def __init__(self, data, mtime):
+        # A string containing the PNG image
+        self.data = data
+        # The modification time of the file the image was read from
+        self.mtime = mtime
+        # A strong entity tag taken from a hash of the image
+        self.etag = '"%s"' % hashlib.md5(data).hexdigest()
+
+class LogoStore():
+    """
+    Keeps every logo in a directory in memory so that serving a logo
+    doesn't touch the disk.
+
+    The directory is checked for new, changed or removed logos at most
+    once every check_interval seconds, so a new logo can be dropped in
+    without restarting the server.
+    """
+    def __init__(self, directory, check_interval=10):
+        # The directory the logos are read from
+        self.directory = directory
+        # Number of seconds between checks of the directory for changes
+        self.check_interval = check_interval
+        # A dictionary of the logos read so far
+        # Keys: file names Values: Logo class instances
+        self.logos = {}
+        # The time the directory was last checked (None if it hasn't been read)
+        self.last_check = None
+
+    def load(self):
+        """
+        Reads any logos in the directory which are new or have changed since
+        they were last read, and forgets any which have been removed.
+        """
+        logos = {}
+        for name in os.listdir(self.directory):
+            if not name.endswith(".png"): continue
+            path = os.path.join(self.directory, name)
+            mtime = os.stat(path).st_mtime
+            logo = self.logos.get(name)
+            if logo is None or logo.mtime != mtime:
+                with open(path, 'rb') as f:
+                    logo = Logo(f.read(), mtime)
+            logos[name] = logo
+        # Requests being served keep whichever set of logos they started with
+        self.logos = logos
+        self.last_check = time.time()
+
+    def get(self, team_name):
+        """
+        Returns the Logo class instance for a team or None if there isn't one.
+        """
+        if self.last_check is None or time.time()-self.last_check >= self.check_interval:
+            self.load()
+        return self.logos.get(logo_file(team_name))
+
+# The store of logos for the teams in the AUDL
+logo_store = LogoStore(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Logos"))
 
 def AUDLlogo(team_name):
-    
-    icon_dict = { 'AlleyCats' : "team_alleycats_on.png",
-                  'Breeze' : "team_breeze_on.png", 
-                  'Dragons' : "team_dragons_on.png", 
-                  'Empire' : "team_empire_on.png", 
-                  'FlameThrowers' : "team_flamethrowers_on.png", 
-                  'Lions' : "team_lions_on.png", 
-                  'Mechanix' : "team_mechanix_on.png",
-                  'Phoenix' : "team_phoenix_on.png",
-                  'Radicals' : "team_radicals_on.png",
-                  'Raptors' : "team_raptors_on.png", 
-                  'Revolution' : "team_revolution_on.png", 
-                  'Riptide' : "team_riptide_on.png", 
-                  'Royal' : "team_royal_on.png", 
-                  'Rush' : "team_rush_on.png", 
-                  'Spiders' : "team_spiders_on.png", 
-                  'Wildfire' : "team_wildfire_on.png", 
-                  'Wind Chill' : "team_windchill_on.png"
-                }
-
-    if team_name in icon_dict.keys():
-        f = open("Logos/"+icon_dict[team_name], 'r')
-        return f.read()
+
+    logo = logo_store.get(team_name)
+    if logo is not None:
+        return logo.data
     else:
         return "Not a valid team name"
-
@@ -0,0 +1,180 @@
+#!/usr/bin/python
+
+"""
+Runs the jobs which keep the server's data up to date.
+
+Every job runs on a single scheduler thread, each at its own interval, so
+jobs never overlap with each other or with themselves. A job which is
+due again while it is still running, or asked to run while it is already
+waiting to, runs once rather than once for every time it came due.
+
+The scheduler keeps the time, duration and outcome of each job's last run.
+"""
+
+import threading, time
+
+class Job():
+    """
+    A function the scheduler runs every so many seconds.
+    """
+    def __init__(self, name, func, interval, next_run):
+        # A string naming the job
+        self.name = name
+        # The function run by the job. It is called with no arguments.
+        self.func = func
+        # Number of seconds from the start of one run to the start of the next
+        self.interval = interval
+        # The time the job is next due
+        self.next_run = next_run
+        # The time the last run started and how many seconds it took
+        # (None if the job hasn't run)
+        self.last_run = None
+        self.duration = None
+        # Counts of the runs made, the runs which raised an error and the
+        # runs which were folded into another one
+        self.runs = 0
+        self.errors = 0
+        self.coalesced = 0
+        # A string describing the error from the last failed run
+        self.last_error = None
+        # Whether the job is running, and whether it was asked to run
+        # again while it was
+        self.running = False
+        self.triggered = False
+
+class Scheduler():
+    """
+    Runs a set of jobs at their own intervals on one thread.
+    """
+    def __init__(self, clock=time.time):
+        # A dictionary of the scheduled jobs
+        # Keys: job names Values: Job class instances
+        self.jobs = {}
+        # The function giving the current time
+        self.clock = clock
+        # Guards the jobs and wakes the scheduler thread when they change
+        self.condition = threading.Condition()
+        # The scheduler thread (None if it isn't running)
+        self.thread = None
+        self.stopping = False
+
+    def add(self, name, func, interval, delay=None):
+        """
+        Adds a job which runs func every interval seconds. The first run is
+        delay seconds from now, or one interval from now if delay isn't given.
+        """
+        delay = interval if delay is None else delay
+        with self.condition:
+            self.jobs[name] = Job(name, func, interval, self.clock() + delay)
+            self.condition.notify()
+        return self.jobs[name]
+
+    def trigger(self, name):
+        """
+        Makes a job due now. If it is running or already due, it still only
+        runs once more.
+        """
+        with self.condition:
+            job = self.jobs[name]
+            now = self.clock()
+            if job.running:
+                if job.triggered: job.coalesced += 1
+                job.triggered = True
+            elif job.next_run <= now:
+                job.coalesced += 1
+            else:
+                job.next_run = now
+            self.condition.notify()
+
+    def run_job(self, job):
+        """
+        Runs a job once and works out when it is next due.
+        """
+        with self.condition:
+            job.running = True
+        start = self.clock()
+        error = None
+        try:
+            job.func()
+        except Exception, e:
+            error = "%s: %s" % (type(e).__name__, e)
+            print "%s job failed - %s" % (job.name, error)
+        end = self.clock()
+
+        with self.condition:
+            job.running = False
+            job.runs += 1
+            job.last_run = start
+            job.duration = end - start
+            if error != None:
+                job.errors += 1
+                job.last_error = error
+            # runs which came due while this one was going are skipped
+            next_run = start + job.interval
+            while next_run <= end:
+                next_run += job.interval
+                job.coalesced += 1
+            if job.triggered:
+                job.triggered = False
+                next_run = end
+            job.next_run = next_run
+
+    def run_pending(self):
+        """
+        Runs every job which is due, in the order they came due, and
+        returns the number of jobs run.
+        """
+        with self.condition:
+            now = self.clock()
+            due = sorted((job.next_run, job.name) for job in self.jobs.values() if job.next_run <= now)
+        for next_run, name in due:
+            self.run_job(self.jobs[name])
+        return len(due)
+
+    def run(self):
+        """
+        Runs jobs as they come due until the scheduler is stopped.
+        """
+        while True:
+            with self.condition:
+                if self.stopping: return
+                wait = min([job.next_run for job in self.jobs.values()] or [self.clock() + 60]) - self.clock()
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+            self.run_pending()
+
+    def start(self):
+        """
+        Starts the scheduler thread.
+        """
+        self.stopping = False
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the scheduler thread once any job it is running has finished.
+        """
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        if self.thread != None: self.thread.join()
+        self.thread = None
+
+    def stats(self):
+        """
+        Returns a dictionary of the last run, duration, counts and next
+        run of each job.
+        """
+        with self.condition:
+            return dict((job.name, { 'last_run': job.last_run,
+                                     'duration': job.duration,
+                                     'next_run': job.next_run,
+                                     'runs': job.runs,
+                                     'errors': job.errors,
+                                     'coalesced': job.coalesced,
+                                     'last_error': job.last_error })
+                        for job in self.jobs.values())
@@ -2,10 +2,14 @@
 
 import SimpleHTTPServer, SocketServer
 import AUDLclasses
-import json
+import json, hashlib, zlib
+import email.utils
 import image_get as ig
 import youtube as yt
-import threading
+import scheduler
+import event_server
+import snapshot_file
+import sys, threading, argparse, os, socket, signal, tempfile, time, shutil, traceback
 
 # Parse a given input path to the server
 def path_parse(path):
@@ -14,34 +18,38 @@ def path_parse(path):
     if path[-1] == '/': path = path[:-1]
 
     path_ents = path.split("/")
-    for ent in path_ents:
-        print ent
 
     return path_ents[1:]
     pass
 
-                  
-def path_data(path, League):
 
-    #Create dictionary for main information:
-    main_pages = { 'Teams'     : League.team_list(),
-                   'News'      : League.news_page_info(),
-                   'Standings' : League.standings(),
-                   'Scores'    : League.return_scores_page(),
-                   'Schedule'  : League.return_schedules(),
-                   'Videos'    : League.get_videos(),
-                   'Stats'     : League.get_top_fives(),
-                   'FAQ'       : "Coming soon",
-                   'Terms_and_Info' : "Coming soon",
-                   'Home'      : (League.news_page_info(),League.get_videos(),League.return_scores_page())}
+# Route table for the main pages of the app. Each page name maps to a
+# function of the League which builds that page, so a request only pays
+# for the page it asks for.
+main_pages = { 'Teams'     : lambda League: League.team_list(),
+               'News'      : lambda League: League.news_page_info(),
+               'Standings' : lambda League: League.standings(),
+               'Scores'    : lambda League: League.return_scores_page(),
+               'Schedule'  : lambda League: League.return_schedules(),
+               'Videos'    : lambda League: League.get_videos(),
+               'Stats'     : lambda League: League.get_top_fives(),
+               'FAQ'       : lambda League: "Coming soon",
+               'Terms_and_Info' : lambda League: "Coming soon",
+               'Home'      : lambda League: (League.news_page_info(),League.get_videos(),League.return_scores_page())}
+
 
+# Pages whose data changes on its own schedule, with a function giving
+# the time it last changed. Other pages use League.Last_update.
+page_modified = { 'Videos' : lambda League: League.videos_modified() }
+
+def path_data(path, League):
 
     path_ents = path_parse(path)
     # If the length of path_ents is one and the page requested exists
-    # then return the info for that page
-    if len(path_ents) == 1 and path_ents[0] in main_pages.keys():
-        return json.dumps(main_pages[path_ents[0]])
-    elif len(path_ents) > 1 and path_ents[0] in main_pages.keys():
+    # then build and return the info for that page only
+    if len(path_ents) == 1 and path_ents[0] in main_pages:
+        return json.dumps(main_pages[path_ents[0]](League))
+    elif len(path_ents) > 1 and path_ents[0] in main_pages:
         return json.dumps(subpage_data(path_ents, League))
     elif len(path_ents) > 1 and path_ents[0] == "Icons":
         return subpage_data(path_ents, League)
@@ -75,6 +83,19 @@ def subpage_data(path_ents, League):
     else:
         return "Not a valid path"
 
+def icon_data(path_ents, team_names):
+    """
+    Returns the image_get.Logo for an Icons path or None if the path
+    doesn't name a team with a logo.
+
+    team_names - a dictionary of team names. Keys: team IDs Values: names
+    """
+    if len(path_ents) != 2: return None
+    # Corner case for the Montreal Royal Logo
+    if path_ents[1] == "1234": return ig.logo_store.get("Royal")
+    if not path_ents[1].isdigit() or int(path_ents[1]) not in team_names: return None
+    return ig.logo_store.get(team_names[int(path_ents[1])])
+
 def team_subpage_data(subpage, team):
     """
     Returns a subpage for a given team class instance. 
@@ -95,49 +116,576 @@ def schedule_page_data(League):
     else:
         return "This League does not contain divisions"
 
+# Number of seconds a kept-alive connection may sit idle before it is closed
+keep_alive_timeout = 15
+# Responses shorter than this many bytes are not worth compressing
+min_compress_size = 256
+# Number of seconds clients may keep using a logo before checking it again
+icon_max_age = 7*24*60*60
+
+def choose_encoding(accept_encoding):
+    """
+    Picks the content coding (gzip, deflate or identity) to send a
+    response in from the value of a request's Accept-Encoding header.
+    """
+    # A dictionary of the codings the client accepts
+    # Keys: coding names Values: their quality values
+    qualities = {}
+    for part in accept_encoding.split(","):
+        fields = part.split(";")
+        coding = fields[0].strip().lower()
+        if coding == '': continue
+        q = 1.0
+        for param in fields[1:]:
+            name, sep, value = param.partition("=")
+            if name.strip() != "q": continue
+            try:
+                q = float(value)
+            except ValueError:
+                q = 0.0
+        qualities[coding] = q
+
+    best, best_q = 'identity', 0.0
+    for coding in ('gzip', 'deflate'):
+        q = qualities.get(coding, qualities.get('*', 0.0))
+        if q > best_q: best, best_q = coding, q
+    return best
+
+def compress(body, encoding):
+    """
+    Returns body compressed with the gzip or deflate content coding.
+    """
+    # gzip wraps the deflate stream in a gzip header rather than a zlib one
+    wbits = 16+zlib.MAX_WBITS if encoding == 'gzip' else zlib.MAX_WBITS
+    compressor = zlib.compressobj(6, zlib.DEFLATED, wbits)
+    return compressor.compress(body) + compressor.flush()
+
+class CachedResponse():
+    """
+    A json encoded response along with the validators a client can
+    use to check whether its own copy of the response is still current.
+
+    Compressed copies of the body are made the first time a client asks
+    for them and kept with the response, so each data generation is
+    compressed at most once per coding.
+    """
+    def __init__(self, body, generation, last_modified, content_type="application/json"):
+        # A string containing the encoded response
+        self.body = body
+        # The media type of the body
+        self.content_type = content_type
+        # A dictionary of the body in each content coding made so far
+        # Keys: coding names Values: encoded bodies
+        self.encoded = {'identity': body}
+        # The League.Generation the response was built from
+        self.generation = generation
+        # A strong entity tag for the response, taken from a hash of its body
+        self.etag = '"%s"' % hashlib.md5(body).hexdigest()
+        # The time (in seconds since the epoch) the data in the response
+        # last changed
+        self.last_modified = int(last_modified)
+
+    def negotiate(self, accept_encoding):
+        """
+        Returns the content coding to send the response in, given the
+        value of the request's Accept-Encoding header.
+        """
+        if len(self.body) < min_compress_size: return 'identity'
+        return choose_encoding(accept_encoding)
+
+    def encode(self, encoding):
+        """
+        Returns the body in the given content coding.
+        """
+        if encoding not in self.encoded:
+            self.encoded[encoding] = compress(self.body, encoding)
+        return self.encoded[encoding]
+
+    def entity_tag(self, encoding='identity'):
+        """
+        Returns the entity tag of the body in the given content coding.
+        Each coding is a different representation, so each gets its own tag.
+        """
+        if encoding == 'identity': return self.etag
+        return self.etag[:-1] + "-" + encoding + '"'
+
+    def not_modified(self, headers, encoding='identity'):
+        """
+        Returns whether or not the request headers show that the client
+        already has this response (If-None-Match or If-Modified-Since).
+        """
+        if_none_match = headers.get('If-None-Match')
+        if if_none_match is not None:
+            etags = [etag.strip() for etag in if_none_match.split(",")]
+            return "*" in etags or self.entity_tag(encoding) in etags
+
+        if_modified_since = headers.get('If-Modified-Since')
+        if if_modified_since is not None:
+            date = email.utils.parsedate_tz(if_modified_since)
+            if date is None: return False
+            return self.last_modified <= email.utils.mktime_tz(date)
+        return False
+
+class ResponseCache():
+    """
+    Keeps the json encoded response for each page of the app so that
+    it is only built once per League data generation.
+
+    Each entry is stored with the League.Generation it was built
+    from. Once a refresh bumps the generation, the entry is rebuilt on
+    the next request rather than served.
+    """
+    def __init__(self):
+        # A dictionary of cached responses
+        # Keys: normalized paths Values: CachedResponse class instances
+        self.entries = {}
+
+    def cache_key(self, path, League):
+        """
+        Returns the key a path is cached under or None if the path
+        should not be cached (icons and invalid paths).
+        """
+        path_ents = path_parse(path)
+        if len(path_ents) == 1 and path_ents[0] in main_pages:
+            return path_ents[0]
+        # team pages ignore anything after the team's ID
+        if len(path_ents) in (2, 3) and path_ents[0] == "Teams" and path_ents[1].isdigit() \
+           and int(path_ents[1]) in League.Teams:
+            return "/".join(path_ents[:2])
+        return None
+
+    def get(self, path, League):
+        """
+        Returns the CachedResponse for path, building it only if it is
+        missing or was built from an older generation of League data.
+        """
+        key = self.cache_key(path, League)
+
+        entry = self.entries.get(key)
+        if entry is not None and entry.generation == League.Generation:
+            return entry
+        # Read the generation before building so that a refresh which
+        # lands part way through marks this entry as stale
+        generation, last_modified = League.Generation, League.Last_update
+        if key in page_modified:
+            last_modified = page_modified[key](League) or last_modified
+        if key is not None:
+            entry = CachedResponse(path_data(path, League), generation, last_modified)
+            self.entries[key] = entry
+        else:
+            entry = CachedResponse(path_data(path, League), generation, last_modified, "text/plain")
+        return entry
+
+response_cache = ResponseCache()
+
+class Snapshot():
+    """
+    Every page of the app built from the League at one moment.
+
+    A snapshot isn't changed once it is built. The refresh builds a new one
+    after updating the League and publishes it by replacing the module's
+    snapshot, so a request reads the same snapshot from start to finish
+    and never sees a refresh half done.
+    """
+    def __init__(self, League, cache=None):
+        if cache is None: cache = response_cache
+        # The League.Generation and League.Last_update the pages were built from
+        self.generation = League.Generation
+        self.last_modified = League.Last_update
+        # A dictionary of the teams' names, used to find their logos
+        # Keys: team IDs Values: team names
+        self.Teams = dict((ID, team.Name) for ID, team in League.Teams.items())
+        # A dictionary of every page in the app
+        # Keys: cache keys (see ResponseCache.cache_key) Values: CachedResponse class instances
+        self.pages = {}
+        for key in main_pages.keys() + ["Teams/%d" % ID for ID in self.Teams]:
+            self.pages[key] = cache.get("/" + key, League)
+        # The response to any path which isn't a page
+        self.invalid = CachedResponse("Not a valid path", self.generation, self.last_modified, "text/plain")
+
+    def get(self, path):
+        """
+        Returns the CachedResponse for path.
+        """
+        return self.pages.get(response_cache.cache_key(path, self), self.invalid)
+
+class MappedResponse(CachedResponse):
+    """
+    A response read from a snapshot file. Its bodies in each content
+    coding are buffers into the mapped file.
+    """
+    def __init__(self, content_type, etag, last_modified, encoded, generation):
+        self.body = encoded['identity']
+        self.content_type = content_type
+        self.encoded = encoded
+        self.generation = generation
+        self.etag = etag
+        self.last_modified = last_modified
+
+class MappedSnapshot(Snapshot):
+    """
+    A snapshot read from a snapshot file (see snapshot_file.read), which
+    worker processes serve without a League of their own.
+    """
+    def __init__(self, generation, teams, pages):
+        self.generation = generation
+        self.Teams = teams
+        self.pages = dict((key, MappedResponse(*(page + (generation,)))) for key, page in pages.items())
+        # the response to invalid paths is stored without a key
+        self.invalid = self.pages.pop(None)
+        self.last_modified = self.invalid.last_modified
+
+def write_snapshot(current, path):
+    """
+    Writes a snapshot to a snapshot file, along with its compressed bodies
+    so that the processes reading it don't compress them again.
+    """
+    pages = {}
+    for key, response in current.pages.items() + [(None, current.invalid)]:
+        encodings = ['identity'] if len(response.body) < min_compress_size else ['identity', 'gzip', 'deflate']
+        pages[key] = (response.content_type, response.etag, response.last_modified,
+                      dict((encoding, response.encode(encoding)) for encoding in encodings))
+    snapshot_file.write(path, current.generation, current.Teams, pages)
+
+def publish(League):
+    """
+    Builds a snapshot of the League and makes it the one requests are
+    answered from.
+    """
+    global snapshot
+    snapshot = Snapshot(League)
+    if snapshot_path != None: write_snapshot(snapshot, snapshot_path)
+    if state_path != None:
+        # the state file only speeds up the next start, so a league which
+        # can't be saved is still served
+        try:
+            AUDLclasses.save_league(League, state_path)
+        except (IOError, OSError), e:
+            print "Couldn't save the league to %s: %s" % (state_path, e)
+
+def respond(path, headers, current=None):
+    """
+    Returns the status, headers and body of the response to a GET request
+    for path. The whole response is made from the same snapshot.
+
+    headers - the request headers (anything with a get method)
+    current - the Snapshot to answer from (server.snapshot if not given)
+    """
+    if current is None: current = snapshot
+
+    #Function for path handling goes here:
+    path_ents = path_parse(path)
+    if path_ents and path_ents[0] == "Icons":
+        return icon_response(icon_data(path_ents, current.Teams), headers)
+
+    response = current.get(path)
+    encoding = response.negotiate(headers.get('Accept-Encoding', ''))
+    response_headers = []
+    # Let the client keep using its copy if it is still current
+    if response.not_modified(headers, encoding):
+        status, body = 304, "" # Send 304 Not Modified
+    else:
+        status, body = 200, response.encode(encoding) # Send 200 OK
+        response_headers.append(("Content-Type", response.content_type))
+        response_headers.append(("Content-Length", str(len(body))))
+        if encoding != 'identity': response_headers.append(("Content-Encoding", encoding))
+    response_headers.append(("Vary", "Accept-Encoding"))
+    response_headers.append(("ETag", response.entity_tag(encoding)))
+    response_headers.append(("Last-Modified", email.utils.formatdate(response.last_modified, usegmt=True)))
+    return status, response_headers, body
+
+def icon_response(logo, headers):
+    """
+    Returns the status, headers and body of the response to a request for
+    a team logo, which is sent straight from the logo store.
+    """
+    if logo is None:
+        body = "Not a valid path"
+        return 404, [("Content-Type", "text/plain"), ("Content-Length", str(len(body)))], body
+
+    etags = [etag.strip() for etag in headers.get('If-None-Match', '').split(",")]
+    if logo.etag in etags:
+        status, body, response_headers = 304, "", [] # Send 304 Not Modified
+    else:
+        status, body = 200, logo.data # Send 200 OK
+        response_headers = [("Content-Type", "image/png"), ("Content-Length", str(len(logo.data)))]
+    response_headers.append(("Cache-Control", "public, max-age=%d" % icon_max_age))
+    response_headers.append(("ETag", logo.etag))
+    return status, response_headers, body
+
 class Handler(SimpleHTTPServer.SimpleHTTPRequestHandler):
 
+    # Every response carries a Content-Length, so connections can be
+    # kept alive between requests
+    protocol_version = "HTTP/1.1"
+    # Number of seconds an idle connection (and the thread serving it)
+    # is kept before it is closed
+    timeout = keep_alive_timeout
+
     def do_GET(self):
-            #We can always respond with json code
-            self.send_response(200) # Send 200 OK
-
-            #Function for path handling goes here:
-            path_ents = path_parse(self.path)
-            if path_ents[0] == "Icons":
-                self.send_header("Content-type","png")
-                self.end_headers()
-            else:
-                self.send_header("Content-type","json")
-                self.end_headers()
-
-            self.wfile.write(path_data(self.path,AUDL))
-
-# Initialize the league class
-AUDL = AUDLclasses.League()
-# Add teams from local files and populate
-# their information from the ultimate-numbers 
-# server
-AUDL.add_teams('Teams_Info')
-# Get news articles for the team
-AUDL.get_news()
-
-
-def main():
-    
+
+            status, headers, body = respond(self.path, self.headers)
+            self.send_response(status)
+            for name, value in headers: self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+# The league class instance (None until start_league is called)
+AUDL = None
+# The snapshot of the league requests are answered from
+snapshot = None
+# The snapshot file new snapshots are written to for worker processes
+# to serve (None unless serving in prefork mode)
+snapshot_path = None
+# The file the league is saved to each time it is published, so the
+# server can start from it next time (None if it isn't saved)
+state_path = None
+# The state file used unless another is given, kept beside Teams_Info
+# rather than in a directory other users can write to
+default_state_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "league_state")
+# The scheduler keeping the league up to date (None until it is started)
+refresher = None
+
+def start_league(warm_start=True):
+    """
+    Builds the league and publishes its first snapshot. Returns whether
+    the league was loaded from state_path rather than built.
+
+    If warm_start is true and the league was saved to state_path, the
+    saved league is used. It's up to the refresh to bring it up to date.
+    """
+    global AUDL
+    if warm_start and state_path != None:
+        AUDL = AUDLclasses.load_league(state_path)
+        if AUDL != None:
+            publish(AUDL)
+            return True
+    # Initialize the league class
+    AUDL = AUDLclasses.League()
+    # Add teams from local files and populate
+    # their information from the ultimate-numbers 
+    # server
+    AUDL.add_teams('Teams_Info')
+    # Get news articles for the team
+    AUDL.get_news()
+    publish(AUDL)
+    return False
+
+
+def make_server(mode, address, max_connections=1000):
+    """
+    Returns a server for the app listening at address.
+
+    mode - "threaded" for a thread per connection or "event" for a
+           single thread serving every connection
+    max_connections - the largest number of connections the event
+                      server keeps open at once
+    """
+    if mode == "event":
+        return event_server.EventServer(address, respond, max_connections, keep_alive_timeout)
+    return SocketServer.ThreadingTCPServer(address, Handler) # Can also use ForkingTCPServer
+
+def make_listener(address):
+    """
+    Returns a socket listening at address which worker processes can
+    share.
+    """
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(address)
+    listener.listen(socket.SOMAXCONN)
+    return listener
+
+def worker(listener, path, max_connections):
+    """
+    Serves connections from a shared listening socket with pages read
+    from the snapshot file at path. Never returns.
+    """
+    reader = snapshot_file.Reader(path, MappedSnapshot)
+    starting = "Starting up"
+
+    def mapped_respond(request_path, headers):
+        current = reader.get()
+        if current is None:
+            return 503, [("Content-Type", "text/plain"), ("Content-Length", str(len(starting)))], starting
+        return respond(request_path, headers, current)
+
+    try:
+        event_server.EventServer(None, mapped_respond, max_connections, sock=listener).serve_forever()
+    finally:
+        os._exit(0)
+
+def start_workers(listener, count, path, max_connections=1000):
+    """
+    Forks count worker processes serving the snapshot file at path and
+    returns their process IDs.
+    """
+    pids = []
+    for i in range(count):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            worker(listener, path, max_connections)
+        pids.append(pid)
+    return pids
+
+def main(argv=None):
+    global state_path, refresher
+
+    parser = argparse.ArgumentParser(description="Serves the AUDL app.")
+    parser.add_argument("--mode", choices=["threaded", "event", "prefork"], default="threaded",
+                        help="serve with a thread per connection, a single event loop, "
+                             "or event loops in several worker processes")
+    parser.add_argument("--port", type=int, default=4000)
+    parser.add_argument("--max-connections", type=int, default=1000,
+                        help="the most connections an event loop keeps open at once")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="the number of worker processes in prefork mode")
+    parser.add_argument("--snapshot-file",
+                        help="the file pages are shared with the workers through in prefork mode "
+                             "(by default, a file in a new private temporary directory)")
+    parser.add_argument("--state-file", default=default_state_file,
+                        help="the file the league is saved to after each refresh and loaded from at startup")
+    parser.add_argument("--cold-start", action="store_true",
+                        help="build the league from ultimate-numbers rather than the state file")
+    args = parser.parse_args(argv)
+    state_path = args.state_file
 
     # Start broadcasting the server
-    PORT=4000
     IP = ""
-    httpd = SocketServer.ThreadingTCPServer((IP, PORT), Handler) # Can also use ForkingTCPServer
-    print "serving at" , IP, "port", PORT
-    httpd.serve_forever()
+    if args.mode != "prefork":
+        httpd = make_server(args.mode, (IP, args.port), args.max_connections)
+        warm = start_league(not args.cold_start)
+        refresher = refresh_scheduler(AUDL, warm).start()
+        print "serving at" , IP, "port", args.port
+        httpd.serve_forever()
+        return
 
-def refresh():
-    threading.Timer(60,refresh).start()
-    AUDL.update_games()
-    AUDL.get_news()
-    print "refreshing server..."
+    # a directory only this user can write to, so no one else can
+    # plant a file for the workers to read
+    snapshot_dir = None
+    if args.snapshot_file is None:
+        snapshot_dir = tempfile.mkdtemp(prefix="audl_")
+        args.snapshot_file = os.path.join(snapshot_dir, "snapshot")
+
+    # This process only supervises. The workers, and the process which
+    # owns the league, are forked from it before the league is built,
+    # so that neither the workers nor their replacements hold a copy
+    listener = make_listener((IP, args.port))
+    pids = start_workers(listener, args.workers, args.snapshot_file, args.max_connections)
+    owner = start_owner(listener, args.snapshot_file, not args.cold_start)
+    owner_started = time.time()
+    print "serving at" , IP, "port", args.port, "with", args.workers, "workers"
+    # stop the workers and the owner when this process is told to stop
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        while True:
+            pid, status = os.wait()
+            if pid == owner:
+                # start the league again from its last saved state, waiting
+                # a while first if it failed straight away
+                time.sleep(max(0, owner_restart_delay - (time.time() - owner_started)))
+                owner = start_owner(listener, args.snapshot_file, True)
+                owner_started = time.time()
+            elif pid in pids:
+                # start a new worker in place of any which stop
+                pids.remove(pid)
+                pids.extend(start_workers(listener, 1, args.snapshot_file, args.max_connections))
+    finally:
+        for pid in pids + [owner]:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+        if snapshot_dir != None: shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+# Number of seconds the process owning the league must have run for to be
+# restarted straight away when it stops
+owner_restart_delay = 10
+
+def league_owner(path, warm_start=True):
+    """
+    Builds the league and keeps it and the snapshot file at path up to
+    date, in a process of its own. Never returns.
+    """
+    global snapshot_path, refresher
+    try:
+        snapshot_path = path
+        warm = start_league(warm_start)
+        refresher = refresh_scheduler(AUDL, warm).start()
+        refresher.thread.join()
+    except:
+        traceback.print_exc()
+    finally:
+        os._exit(1)
+
+def start_owner(listener, path, warm_start=True):
+    """
+    Forks the process which owns the league (see league_owner) and
+    returns its process ID.
+    """
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        # the owner doesn't serve requests
+        listener.close()
+        league_owner(path, warm_start)
+    return pid
+
+# Number of seconds between refreshes of the games of teams playing now,
+# of every team's games, of the news and of the videos
+live_interval = 30
+games_interval = 15*60
+news_interval = 10*60
+videos_interval = 60*60
+# Number of seconds between reports of how the refresh jobs are doing
+stats_interval = 15*60
+
+def refresh_job(League, update):
+    """
+    Returns a job which runs update and then publishes a new snapshot
+    if the League's data changed.
+    """
+    def job():
+        generation = League.Generation
+        update()
+        if League.Generation != generation: publish(League)
+    return job
+
+def refresh_scheduler(League, refresh_now=False):
+    """
+    Returns a scheduler which keeps the league's data up to date. Teams
+    with a game in progress are polled every live_interval seconds and
+    all of the teams every games_interval seconds. The news and videos
+    are refreshed every news_interval and videos_interval seconds, and
+    the jobs' stats are printed every stats_interval seconds.
+
+    refresh_now - whether every team's games, the news and the videos are
+                  refreshed straight away, as for a league loaded from a file
+    """
+    delay = 0 if refresh_now else None
+    refresher = scheduler.Scheduler()
+    refresher.add("live games", refresh_job(League, League.update_live_games), live_interval)
+    refresher.add("games", refresh_job(League, League.update_games), games_interval, delay)
+    refresher.add("news", refresh_job(League, League.get_news), news_interval, delay)
+    refresher.add("videos", refresh_job(League, League.update_videos), videos_interval, delay)
+    refresher.add("stats", lambda: log_stats(refresher), stats_interval)
+    return refresher
+
+def log_stats(refresher):
+    """
+    Prints the runs, errors and last run of each of a scheduler's jobs.
+    """
+    now = time.time()
+    for name, stats in sorted(refresher.stats().items()):
+        if stats['last_run'] is None:
+            print "%s: not run yet, due in %ds" % (name, stats['next_run'] - now)
+            continue
+        line = "%s: %d runs, %d errors, %d coalesced, last run %ds ago took %.2fs" % (
+            name, stats['runs'], stats['errors'], stats['coalesced'],
+            now - stats['last_run'], stats['duration'])
+        if stats['last_error'] != None: line += ", last error: " + stats['last_error']
+        print line
 
 if __name__ == "__main__":
-    refresh()
     main()
@@ -0,0 +1,124 @@
+#!/usr/bin/python
+
+"""
+Shares the pages of a server snapshot between processes through a file
+which each process maps into memory.
+
+The file starts with a header holding a magic string, the generation of
+the League data the pages were built from and the length of the index.
+The index gives each page's content type, entity tag, modification time
+and the offset and length of its body in each content coding. The bodies
+follow the index.
+
+A new snapshot is written under a temporary name and renamed over the old
+one, so a reader never sees a partly written file. The file should be kept
+in a directory only the server can write to, since the workers trust what
+is in it. A reader which still
+has the old file mapped keeps a consistent copy until it maps the new one.
+"""
+
+import os, mmap, marshal, struct, time, tempfile
+
+magic = "AUDLSNAP"
+# The magic string, generation and index length
+header = struct.Struct("<8sqQ")
+
+class SnapshotFileError(IOError):
+    """
+    Raised when a file isn't a snapshot file.
+    """
+    pass
+
+def write(path, generation, teams, pages):
+    """
+    Writes a snapshot file.
+
+    generation - the League.Generation the pages were built from
+    teams - a dictionary of team names. Keys: team IDs Values: names
+    pages - a dictionary of pages. Keys: cache keys Values: (content type,
+            entity tag, last modified, bodies) tuples, where bodies is a
+            dictionary of the page's body in each content coding
+    """
+    index = {}
+    bodies = []
+    offset = 0
+    for key, (content_type, etag, last_modified, encoded) in pages.items():
+        spans = {}
+        for encoding, body in encoded.items():
+            spans[encoding] = (offset, len(body))
+            bodies.append(body)
+            offset += len(body)
+        index[key] = (content_type, etag, last_modified, spans)
+    index = marshal.dumps((teams, index))
+
+    # the temporary file is made beside path, with a name no one else
+    # can guess or plant a link at
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                     dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header.pack(magic, generation, len(index)))
+            f.write(index)
+            for body in bodies: f.write(body)
+        os.rename(temp_path, path)
+    except:
+        os.remove(temp_path)
+        raise
+
+def read(path):
+    """
+    Maps a snapshot file into memory and returns its generation, teams
+    and pages in the form given to write. The bodies are buffers into the
+    mapped file rather than copies of it.
+    """
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(data) < header.size: raise SnapshotFileError("%s is too short" % path)
+    file_magic, generation, index_length = header.unpack_from(data, 0)
+    if file_magic != magic: raise SnapshotFileError("%s is not a snapshot file" % path)
+
+    start = header.size + index_length
+    teams, index = marshal.loads(data[header.size:start])
+    pages = {}
+    for key, (content_type, etag, last_modified, spans) in index.items():
+        encoded = dict((encoding, buffer(data, start + offset, length))
+                       for encoding, (offset, length) in spans.items())
+        pages[key] = (content_type, etag, last_modified, encoded)
+    return generation, teams, pages
+
+class Reader():
+    """
+    Keeps the latest snapshot file mapped, mapping it again when it has
+    been replaced.
+    """
+    def __init__(self, path, build, check_interval=0.5):
+        # The path of the snapshot file
+        self.path = path
+        # A function of a file's generation, teams and pages which
+        # returns the snapshot to serve
+        self.build = build
+        # Number of seconds between checks of whether the file was replaced
+        self.check_interval = check_interval
+        # The snapshot built from the file, the file's identity (device and
+        # inode) and the time it was last checked
+        self.snapshot = None
+        self.identity = None
+        self.last_check = None
+
+    def get(self):
+        """
+        Returns the snapshot built from the newest file, or None if there
+        isn't a file yet.
+        """
+        now = time.time()
+        if self.last_check is not None and now - self.last_check < self.check_interval:
+            return self.snapshot
+        self.last_check = now
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return self.snapshot
+        if (stat.st_dev, stat.st_ino) != self.identity:
+            self.snapshot = self.build(*read(self.path))
+            self.identity = (stat.st_dev, stat.st_ino)
+        return self.snapshot
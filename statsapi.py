@@ -0,0 +1,194 @@
+#!/usr/bin/python
+
+"""
+A client for the ultimate-numbers REST API.
+
+The client keeps a pool of open HTTP/1.1 connections to the server so that
+each request doesn't pay for a new TCP handshake. Requests time out after a
+set number of seconds and are retried with a growing delay when they fail.
+The client also counts its requests and keeps a histogram of their latencies.
+
+The client remembers the last response for each path. Requests carry its
+validators so the server can answer 304 Not Modified, and a body identical
+to the last one isn't decoded again. Either way the caller gets back the
+very same data object as last time, so it can tell nothing has changed.
+"""
+
+import httplib, urlparse, socket, json, time, threading, Queue, hashlib
+
+base_url = 'http://www.ultimate-numbers.com/rest/view'
+
+# Upper bounds (in seconds) of the buckets in the latency histogram
+latency_buckets = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf')]
+
+class StatsError(IOError):
+    """
+    Raised when the server doesn't give a good answer to a request.
+    """
+    pass
+
+class StatsClient():
+    """
+    Makes requests to the ultimate-numbers server over a pool of
+    persistent connections.
+    """
+    def __init__(self, url=base_url, pool_size=8, timeout=10, retries=2, backoff=0.5):
+        parts = urlparse.urlsplit(url)
+        # The host, port and path prefix of the API
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        # The largest number of connections open to the server at once
+        self.pool_size = pool_size
+        # Number of seconds to wait on a single request before giving up
+        self.timeout = timeout
+        # Number of times a failed request is tried again
+        self.retries = retries
+        # Number of seconds to wait before the first retry. The wait
+        # doubles for each retry after that.
+        self.backoff = backoff
+        # Connections which are open and not in use
+        self.idle = Queue.LifoQueue()
+        # Limits the connections in use to pool_size
+        self.slots = threading.BoundedSemaphore(pool_size)
+        self.lock = threading.Lock()
+        # Counts of the requests made, connections opened, retries made
+        # and requests which failed after all of their retries
+        self.requests = 0
+        self.connections = 0
+        self.retries_made = 0
+        self.errors = 0
+        # Counts of the responses which were 304 Not Modified and of
+        # those whose body was the same as the last one
+        self.not_modified = 0
+        self.unchanged = 0
+        # A list of request counts for each bucket in latency_buckets
+        self.latencies = [0]*len(latency_buckets)
+        # A dictionary of the last good response for each path
+        # Keys: paths Values: (ETag, Last-Modified, body digest, decoded data) tuples
+        self.responses = {}
+
+    def checkout(self):
+        """
+        Returns an idle connection if there is one or a new one otherwise,
+        along with whether or not it is a new connection.
+        """
+        try:
+            return self.idle.get_nowait(), False
+        except Queue.Empty:
+            with self.lock: self.connections += 1
+            return httplib.HTTPConnection(self.host, self.port, timeout=self.timeout), True
+
+    def record(self, seconds):
+        """
+        Adds the latency of a request to the histogram.
+        """
+        with self.lock:
+            self.requests += 1
+            for i, bound in enumerate(latency_buckets):
+                if seconds <= bound:
+                    self.latencies[i] += 1
+                    break
+
+    def request(self, path, headers):
+        """
+        Makes a single GET request for path and returns the response and
+        its body. The connection is put back in the pool unless the server
+        is closing it.
+        """
+        self.slots.acquire()
+        try:
+            while True:
+                conn, new = self.checkout()
+                start = time.time()
+                try:
+                    conn.request("GET", self.prefix + path, headers=headers)
+                    response = conn.getresponse()
+                    body = response.read()
+                except (httplib.HTTPException, socket.error):
+                    conn.close()
+                    # the server may have closed an idle connection, in
+                    # which case try again on a new one straight away
+                    if new: raise
+                    continue
+                self.record(time.time()-start)
+
+                if response.will_close: conn.close()
+                else: self.idle.put(conn)
+                return response, body
+        finally:
+            self.slots.release()
+
+    def fetch(self, path):
+        """
+        Makes a conditional request for path and returns the decoded json
+        data. If the data hasn't changed since the last request for path,
+        the data returned last time is returned again.
+        """
+        headers = {'Accept': 'application/json'}
+        last = self.responses.get(path)
+        if last != None:
+            if last[0] != None: headers['If-None-Match'] = last[0]
+            if last[1] != None: headers['If-Modified-Since'] = last[1]
+
+        response, body = self.request(path, headers)
+        if response.status == 304 and last != None:
+            with self.lock: self.not_modified += 1
+            return last[3]
+        if response.status != 200:
+            raise StatsError("%d response for %s" % (response.status, path))
+
+        digest = hashlib.md5(body).digest()
+        if last != None and last[2] == digest:
+            with self.lock: self.unchanged += 1
+            return last[3]
+        data = json.loads(body)
+        self.responses[path] = (response.getheader('ETag'), response.getheader('Last-Modified'), digest, data)
+        return data
+
+    def get_json(self, path):
+        """
+        Requests path from the server and returns the decoded json data,
+        retrying with backoff if the request fails.
+        """
+        for attempt in range(self.retries+1):
+            try:
+                return self.fetch(path)
+            except (StatsError, httplib.HTTPException, socket.error, ValueError):
+                if attempt == self.retries:
+                    with self.lock: self.errors += 1
+                    raise
+                with self.lock: self.retries_made += 1
+                time.sleep(self.backoff*2**attempt)
+
+    def stats(self):
+        """
+        Returns a dictionary of the client's request counts and latency histogram.
+        """
+        with self.lock:
+            return { 'requests': self.requests,
+                     'connections': self.connections,
+                     'retries': self.retries_made,
+                     'errors': self.errors,
+                     'not_modified': self.not_modified,
+                     'unchanged': self.unchanged,
+                     'latencies': zip(latency_buckets, self.latencies) }
+
+    def close(self):
+        """
+        Closes all idle connections.
+        """
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except Queue.Empty:
+                return
+
+# The client shared by everything that talks to ultimate-numbers
+client = StatsClient()
+
+def get_json(path):
+    """
+    Requests path from the ultimate-numbers server using the shared client.
+    """
+    return client.get_json(path)
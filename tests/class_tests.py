@@ -6,7 +6,7 @@ sys.path.append('..')
 import AUDLclasses
 import MediaClasses
 from datetime import datetime as dt
-import gc, os
+import gc, os, random, tempfile, shutil
 
 
 def test_League_attrs():
@@ -181,6 +181,196 @@ def test_team_add_games():
     assert type(test_team.Games) is dict
     assert 14 == len(test_team.Games)
 
+def test_get_news_unchanged():
+
+    test_league = AUDLclasses.League()
+    test_league.get_news()
+    generation = test_league.Generation
+    articles = dict(test_league.News)
+
+    # fetching the same articles again changes nothing
+    test_league.get_news()
+    assert generation == test_league.Generation
+    assert articles == test_league.News
+    assert "AUDL News" == test_league.news_page_info()[0]
+
+def test_save_league():
+
+    test_league = AUDLclasses.League()
+    test_league.add_teams(players=False, stats=False)
+    test_league.get_news()
+    filename = tempfile.mktemp()
+    try:
+        AUDLclasses.save_league(test_league, filename)
+        loaded = AUDLclasses.load_league(filename)
+    finally:
+        os.remove(filename)
+
+    assert loaded is not test_league
+    assert test_league.Generation == loaded.Generation
+    assert sorted(test_league.team_list()) == sorted(loaded.team_list())
+    assert test_league.standings() == loaded.standings()
+    assert test_league.return_schedules() == loaded.return_schedules()
+    assert test_league.news_page_info() == loaded.news_page_info()
+    # the loaded teams and games still point at the loaded league
+    team = loaded.Teams.values()[0]
+    assert loaded is team.League
+    assert loaded is team.Games.values()[0].League
+
+def test_load_league_missing():
+
+    filename = tempfile.mktemp()
+    assert None == AUDLclasses.load_league(filename)
+
+    # leagues saved in another format aren't loaded
+    with open(filename, 'wb') as f:
+        AUDLclasses.cPickle.dump((AUDLclasses.state_version - 1, None), f)
+    try:
+        assert None == AUDLclasses.load_league(filename)
+    finally:
+        os.remove(filename)
+
+def test_game_status():
+
+    test_game = AUDLclasses.Game('5/9/14','5:30 PM CST','2014','Minnesota Wind Chill','Madison Radicals')
+    assert dt(2014,5,9,17,30) == test_game.start_time()
+    assert None == AUDLclasses.Game('5/9/14','TBD','2014','A','B').start_time()
+    assert dt(2014,5,9,19) == AUDLclasses.Game('5/9/14','7:00 EST','2014','A','B').start_time()
+
+    # before there is a record, the schedule is used
+    assert False == test_game.in_progress(dt(2014,5,9,17,29))
+    assert True == test_game.in_progress(dt(2014,5,9,18))
+    assert False == test_game.in_progress(dt(2014,5,10,0))
+
+    test_game.timestamp = "2014-05-09 17:45"
+    test_game.set_status(dt(2014,5,9,20))
+    assert 1 == test_game.status
+    test_game.set_status(dt(2014,5,10,12))
+    assert 0 == test_game.status
+    assert False == test_game.in_progress(dt(2014,5,9,17))
+
+def test_live_teams():
+
+    test_league = AUDLclasses.League()
+    store = test_league.Game_store
+    radicals = AUDLclasses.Team(test_league, 224002, "Radicals", "Madison")
+    wind_chill = AUDLclasses.Team(test_league, 210001, "Wind Chill", "Minnesota")
+    rush = AUDLclasses.Team(test_league, 1, "Rush", "Toronto")
+    game = store.add(radicals, '5/9/14', '5:30 PM', 2014, 'Minnesota Wind Chill', 'Madison Radicals')
+    store.add(wind_chill, '5/9/14', '5:30 PM', 2014, 'Minnesota Wind Chill', 'Madison Radicals')
+    store.add(rush, '5/9/14', '9:00 PM', 2014, 'Toronto Rush', 'DC Breeze')
+
+    assert [game] == store.games_on(dt(2014,5,9).date())[:1]
+    assert [] == store.games_on(dt(2014,5,8).date())
+
+    assert set() == test_league.live_teams(dt(2014,5,9,12))
+    assert set([224002, 210001]) == test_league.live_teams(dt(2014,5,9,18))
+    # a late game is still going after midnight
+    assert set([1]) == test_league.live_teams(dt(2014,5,10,1))
+
+def test_records_by_date():
+
+    data = [{"timestamp": "2014-05-09 17:30", "ours": 10, "theirs": 8},
+            {"opponentName": "no timestamp"},
+            {"timestamp": "2014-05-10 17:30", "ours": 1, "theirs": 0},
+            {"timestamp": "2014-05-09 20:30", "ours": 3, "theirs": 2}]
+    records = AUDLclasses.records_by_date(data)
+
+    assert [dt(2014,5,9).date(), dt(2014,5,10).date()] == sorted(records)
+    assert [data[0], data[3]] == records[dt(2014,5,9).date()]
+
+def test_match_records():
+
+    test_game = AUDLclasses.Game('5/9/14','7:00 PM','2014','Minnesota Wind Chill','Madison Radicals')
+    test_game.match_records([{"timestamp": "2014-05-09 17:30", "ours": 3, "theirs": 2},
+                             {"timestamp": "2014-05-09 20:30", "ours": 10, "theirs": 8},
+                             {"timestamp": "2014-05-09 21:30", "ours": 8, "theirs": 10}], False)
+    # the first of the highest scoring records is used
+    assert [8, 10] == [test_game.home_score, test_game.away_score]
+    assert "2014-05-09 20:30" == test_game.timestamp
+
+    # a lower scoring record doesn't replace it
+    test_game.match_records([{"timestamp": "2014-05-09 17:30", "ours": 3, "theirs": 2}], True)
+    assert [8, 10] == [test_game.home_score, test_game.away_score]
+
+def test_get_games_info_changes():
+
+    test_team = AUDLclasses.Team(None, 224002, "Radicals", "Madison")
+    test_team.add_games('test_game_data.json')
+    game = test_team.Games['5/9/14']
+
+    # count the times the game is matched to its records
+    matched = []
+    match_records = AUDLclasses.Game.__dict__['match_records']
+    def counting(self, records, home):
+        if self is game: matched.append(records)
+        match_records(self, records, home)
+    AUDLclasses.Game.match_records = counting
+    try:
+        data = [{"timestamp": "2014-05-09 17:30", "ours": 10, "theirs": 8},
+                {"timestamp": "2014-05-10 17:30", "ours": 1, "theirs": 0}]
+        test_team.get_games_info(data)
+        assert 1 == len(matched)
+        # only the record from the day of the game is matched
+        assert [data[0]] == matched[0]
+        assert [8, 10] == [game.home_score, game.away_score]
+
+        # the same list again is skipped, as is a new list with the same records
+        test_team.get_games_info(data)
+        test_team.get_games_info([dict(record) for record in data])
+        assert 1 == len(matched)
+
+        # a change to another day's record doesn't touch the game
+        data = [data[0], {"timestamp": "2014-05-10 17:30", "ours": 2, "theirs": 0}]
+        test_team.get_games_info(data)
+        assert 1 == len(matched)
+
+        data = [{"timestamp": "2014-05-09 17:30", "ours": 12, "theirs": 8}, data[1]]
+        test_team.get_games_info(data)
+        assert 2 == len(matched)
+        assert [8, 12] == [game.home_score, game.away_score]
+    finally:
+        AUDLclasses.Game.match_records = match_records
+
+def test_read_schedule():
+
+    schedule = AUDLclasses.read_schedule('test_game_data.json')
+
+    assert type(schedule) is dict
+    # team names are stored without trailing whitespace
+    assert 2 == len(schedule), schedule.keys()
+    assert 1 == len(schedule['Minnesota Wind Chill'])
+    assert 1 == len(schedule['Madison Radicals'])
+
+    game = schedule['Madison Radicals'][0]
+    assert 6 == len(game)
+    assert game[3] == 'Minnesota Wind Chill'
+    assert game[4] == 'Madison Radicals'
+
+def test_read_players():
+
+    players = AUDLclasses.read_players('test_players.json')
+
+    assert type(players) is dict
+    assert 6 == len(players['Madison Radicals'])
+    assert ('Tom', 'Annen', 7) in players['Madison Radicals']
+
+def test_league_season_files():
+    """
+    Every team in the league should be loaded from a single read
+    of each season file.
+    """
+    test_league = AUDLclasses.League()
+    test_league.add_teams('multiple_teams_info',games=False,players=False,stats=False)
+
+    for team in test_league.Teams:
+        test_league.Teams[team].add_games('test_game_data.json')
+        test_league.Teams[team].add_players('test_players.json')
+
+    assert 2 == len(test_league.Season_files), test_league.Season_files.keys()
+    assert 6 == len(test_league.Teams[224002].Players)
+    assert 1 == len(test_league.Teams[224002].Games)
+
 def test_team_add_players():
 
     test_team = AUDLclasses.Team(None, 224002, "Radicals", "Madison")
@@ -265,6 +455,79 @@ def pop_team_stats_setup():
 
     return test_league
 
+def test_leaderboard():
+
+    test_board = AUDLclasses.Leaderboard()
+
+    test_board.update((224002, 'Tom Annen'), 'Tom Annen', 8)
+    test_board.update((224002, 'Ben Nelson'), 'Ben Nelson', 9)
+    test_board.update((210001, 'Jon Duddy'), 'Jon Duddy', 3)
+
+    assert [('Ben Nelson', 9, 224002), ('Tom Annen', 8, 224002)] == test_board.top(2)
+    assert 3 == len(test_board.top(10))
+
+    # changing a value moves the player
+    test_board.update((210001, 'Jon Duddy'), 'Jon Duddy', 12)
+    assert ('Jon Duddy', 12, 210001) == test_board.top(1)[0]
+    assert 3 == len(test_board)
+
+    test_board.remove((210001, 'Jon Duddy'))
+    assert [('Ben Nelson', 9, 224002), ('Tom Annen', 8, 224002)] == test_board.top(5)
+
+def test_league_leaders():
+
+    test_league = AUDLclasses.League()
+    test_league.add_teams('multiple_teams_info',games=False,players=False,stats=False)
+    for team in test_league.Teams:
+        test_league.Teams[team].add_players('test_players.json')
+
+    # player data as it comes from the ultimate-numbers server
+    gen_player_data = [ {'number': '7', 'name': 'Tom A'}, {'number': '68', 'name': 'Ben N'} ]
+    player_stats_data = [ {'playerName': 'Tom A', 'goals': 8, 'assists': 2},
+                          {'playerName': 'Ben N', 'goals': 9, 'assists': 1} ]
+    test_league.Teams[224002].add_player_stats((gen_player_data, player_stats_data))
+
+    leaders = test_league.top_five_league('goals')
+    assert 5 == len(leaders)
+    assert ('Ben Nelson', 9, 224002) == leaders[0], leaders
+    assert ('Tom Annen', 8, 224002) == leaders[1], leaders
+    assert ('Tom Annen', 2, 224002) == test_league.leaders('assists', 1)[0]
+
+    # new numbers from the server reorder the leaders
+    player_stats_data[0]['goals'] = 11
+    test_league.Teams[224002].add_player_stats((gen_player_data, player_stats_data))
+    assert ('Tom Annen', 11, 224002) == test_league.top_five_league('goals')[0]
+    assert 10 == len(test_league.leaders('goals', 100))
+
+def test_add_player_stats_unmatched():
+
+    test_team = AUDLclasses.Team(None, 224002, "Radicals", "Madison")
+    test_team.add_players('test_players.json')
+    gen_player_data = [ {'number': '7', 'name': 'Tom A'}, {'number': '68', 'name': 'Ben N'} ]
+    player_stats_data = [ {'playerName': 'Tom A', 'goals': 8} ]
+
+    unmatched = test_team.add_player_stats((gen_player_data, player_stats_data))
+
+    assert 8 == test_team.Players['Tom Annen'].Stats['goals']
+    assert 0 == test_team.Players['Tom Annen'].Stats['assists']
+    # Ben Nelson has a number on the server but no stats
+    assert 'Ben Nelson' in unmatched
+    assert 'Tom Annen' not in unmatched
+    assert len(test_team.Players)-1 == len(unmatched)
+    assert unmatched == test_team.Unmatched_players
+
+def test_add_player_numbers():
+
+    test_team = AUDLclasses.Team(None, 224002, "Radicals", "Madison")
+    test_team.add_players('test_players.json')
+    data = [ {'number': '99', 'name': 'Tom Annen'}, {'number': '98', 'name': 'Ben'} ]
+
+    unmatched = test_team.add_player_numbers(data=data)
+
+    assert '99' == test_team.Players['Tom Annen'].Number
+    assert '98' == test_team.Players['Ben Nelson'].Number
+    assert len(test_team.Players)-2 == len(unmatched)
+
 def test_player_attrs():
 
     test_player = AUDLclasses.Player("Tom","Annen",11)
@@ -309,6 +572,32 @@ def test_game_attrs():
 
     assert type(test_game.Quarter) is int
 
+def test_game_store():
+
+    test_store = AUDLclasses.GameStore()
+    radicals = AUDLclasses.Team(None, 224002, "Radicals", "Madison")
+    wind_chill = AUDLclasses.Team(None, 210001, "Wind Chill", "Minnesota")
+
+    first = test_store.add(radicals, '5/9/14', '7:00 PM', 2014, 'Minnesota Wind Chill', 'Madison Radicals')
+    # the same game added by the other team is the same instance
+    second = test_store.add(wind_chill, '5/9/14', '7:00 PM', 2014, 'Minnesota Wind Chill ', 'Madison Radicals')
+    assert first is second
+    assert 1 == len(test_store)
+
+    early = test_store.add(radicals, '4/12/14', '7:00 PM', 2014, 'Madison Radicals', 'Chicago Wildfire')
+    late = test_store.add(wind_chill, '6/1/14', '7:00 PM', 2014, 'Minnesota Wind Chill', 'Detroit Mechanix')
+    assert 3 == len(test_store)
+
+    # games come back in date order up to the date given
+    assert [early, first, late] == test_store.games_until(dt(2014,6,1).date())
+    assert [early, first] == test_store.games_until(dt(2014,5,9).date())
+    assert [] == test_store.games_until(dt(2014,4,11).date())
+
+    # and can be limited to a set of teams
+    assert [early, first] == test_store.games_until(dt(2014,7,1).date(), [224002])
+    assert [first, late] == test_store.games_until(dt(2014,7,1).date(), [210001])
+    assert [] == test_store.games_until(dt(2014,7,1).date(), [1])
+
 def test_game_exist():
     """
     Uses league data to make sure that game exists is working properly
@@ -352,6 +641,22 @@ def test_league_game_exist():
     assert (True,game_inst) == test_league.league_game_exist('Minnesota Wind Chill', '4/12/14')
 
     
+def test_league_name_to_id():
+
+    test_league = AUDLclasses.League()
+    test_league.add_teams('multiple_teams_info',games=False,players=False,stats=False)
+
+    assert 224002 == test_league.name_to_id('Madison Radicals')
+    # trailing whitespace and casing are ignored
+    assert 210001 == test_league.name_to_id('Minnesota Wind Chill ')
+    assert 210001 == test_league.name_to_id('minnesota wind chill')
+    # unknown teams and aliases
+    assert 0 == test_league.name_to_id('Dubai Ranchers')
+    assert 1234 == test_league.name_to_id('Montreal Royal')
+
+    assert test_league.Teams[224002] is test_league.name_to_team('Madison Radicals ')
+    assert None == test_league.name_to_team('Dubai Ranchers')
+
 def test_league_videos():
 
     test_league = AUDLclasses.League()
@@ -410,6 +715,50 @@ def team_record_setup():
     return test_team
 
 
+def full_standings(test_league):
+    """
+    Builds the standings from every team's full record.
+    """
+    standings_list=[]
+    for div,teams in test_league.Divisions.items():
+        div_list=[]
+        for team in teams:
+            t = test_league.Teams[team]
+            rec = t.record()
+            div_list.append((t.full_name(),rec[0], rec[1], rec[2]))
+        div_list.sort(key= lambda set: (set[1],set[2],set[3]), reverse=True)
+        div_list.insert(0,div)
+        standings_list.append(div_list)
+    return standings_list
+
+def test_league_standings():
+    """
+    Sets random scores for random games in the league and checks that the
+    standings kept up to date as scores change match the standings built
+    from every team's full record.
+    """
+    test_league = AUDLclasses.League()
+    test_league.add_teams('Teams_Info',games=False,players=False,stats=False)
+    for team in test_league.Teams:
+        test_league.Teams[team].add_games()
+
+    games = test_league.Game_store.Games.values()
+    rand = random.Random(638)
+
+    assert full_standings(test_league) == test_league.standings()
+    for update in range(200):
+        game = rand.choice(games)
+        if rand.random() < 0.5:
+            game.set_score(rand.randint(0,30), rand.randint(0,30))
+        else:
+            # a score as it comes from ultimate-numbers
+            record = {'timestamp': game.game_date.strftime("%Y-%m-%d") + " 19:00",
+                      'ours': rand.randint(0,30), 'theirs': rand.randint(0,30)}
+            game.match_game([record], rand.random() < 0.5)
+        if update % 10 == 0:
+            assert full_standings(test_league) == test_league.standings()
+    assert full_standings(test_league) == test_league.standings()
+
 def test_team_roster():
     test_league = team_roster_setup()
 
@@ -445,3 +794,22 @@ def team_roster_setup():
     test_league.add_teams("single_team_info",games=False,players=False,stats=False)
 
     return test_league
+
+def test_save_league_private():
+
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, "league")
+    # a link planted at the old, predictable temporary name isn't followed
+    target = os.path.join(directory, "target")
+    open(target, 'w').write("keep")
+    os.symlink(target, "%s.%d.tmp" % (filename, os.getpid()))
+    try:
+        AUDLclasses.save_league(AUDLclasses.League(), filename)
+        assert "keep" == open(target).read()
+        assert None != AUDLclasses.load_league(filename)
+
+        # a file others can write to isn't loaded
+        os.chmod(filename, 0666)
+        assert None == AUDLclasses.load_league(filename)
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,186 @@
+#!/usr/bin/python
+
+
+import sys
+sys.path.append('..')
+import server
+import event_server
+import server_tests
+import threading, httplib, socket, time, resource, StringIO
+from nose.plugins.skip import SkipTest
+
+def event_setup(max_connections=1000):
+    """
+    Starts an event server on a free port answering from a snapshot
+    of a test league.
+    """
+    test_league = server_tests.cache_test_league()
+    test_league.size = 50
+    test_league.Teams[224002] = server_tests.cache_test_team("Radicals")
+    snapshot = server.Snapshot(test_league, server.ResponseCache())
+    httpd = event_server.EventServer(("127.0.0.1", 0),
+                                     lambda path, headers: server.respond(path, headers, snapshot),
+                                     max_connections)
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={'poll_interval': 0.05})
+    thread.daemon = True
+    thread.start()
+    return httpd
+
+def event_tear_down(httpd):
+
+    httpd.shutdown()
+    httpd.server_close()
+
+def read_responses(sock, count):
+    """
+    Reads count responses from a socket and returns their status codes
+    and bodies.
+    """
+    stream = sock.makefile('rb')
+    responses = []
+    for i in range(count):
+        status = int(stream.readline().split()[1])
+        length = 0
+        while True:
+            line = stream.readline().strip()
+            if not line: break
+            name, value = line.split(":", 1)
+            if name.lower() == 'content-length': length = int(value)
+        responses.append((status, stream.read(length)))
+    return responses
+
+def test_event_keep_alive():
+
+    httpd = event_setup()
+    try:
+        conn = httplib.HTTPConnection("127.0.0.1", httpd.server_address[1])
+        conn.request("GET", "/Teams", headers={'Accept-Encoding': 'gzip'})
+        response = conn.getresponse()
+        body = response.read()
+        assert 200 == response.status
+        assert 'gzip' == response.getheader('Content-Encoding')
+        assert len(body) == int(response.getheader('Content-Length'))
+
+        # the connection is used again for a conditional request
+        conn.request("GET", "/Teams", headers={'Accept-Encoding': 'gzip',
+                                               'If-None-Match': response.getheader('ETag')})
+        response = conn.getresponse()
+        assert 304 == response.status
+        assert '' == response.read()
+
+        conn.request("GET", "/Icons/224002")
+        response = conn.getresponse()
+        assert 'image/png' == response.getheader('Content-Type')
+        response.read()
+        conn.close()
+    finally:
+        event_tear_down(httpd)
+
+def test_event_pipelining():
+
+    httpd = event_setup()
+    try:
+        sock = socket.create_connection(("127.0.0.1", httpd.server_address[1]))
+        # three requests sent at once are answered in order
+        sock.sendall("GET /Teams/224002 HTTP/1.1\r\nHost: x\r\n\r\n"
+                     "GET /Nonsense HTTP/1.1\r\nHost: x\r\n\r\n"
+                     "GET /Icons/1 HTTP/1.1\r\nHost: x\r\n\r\n")
+        responses = read_responses(sock, 3)
+        sock.close()
+    finally:
+        event_tear_down(httpd)
+
+    assert [(200, '[[], [], []]'), (200, 'Not a valid path'), (404, 'Not a valid path')] == responses
+
+def test_event_connection_close():
+
+    httpd = event_setup()
+    try:
+        sock = socket.create_connection(("127.0.0.1", httpd.server_address[1]))
+        sock.sendall("GET /Teams HTTP/1.0\r\n\r\n")
+        assert 200 == read_responses(sock, 1)[0][0]
+        # the server closes an HTTP/1.0 connection after answering
+        sock.settimeout(5)
+        assert '' == sock.recv(1)
+        sock.close()
+
+        sock = socket.create_connection(("127.0.0.1", httpd.server_address[1]))
+        sock.sendall("POST /Teams HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}")
+        assert 501 == read_responses(sock, 1)[0][0]
+        sock.close()
+    finally:
+        event_tear_down(httpd)
+
+def test_event_connection_limit():
+
+    httpd = event_setup(max_connections=1)
+    try:
+        first = socket.create_connection(("127.0.0.1", httpd.server_address[1]))
+        first.sendall("GET /Teams HTTP/1.1\r\n\r\n")
+        assert 200 == read_responses(first, 1)[0][0]
+
+        # the second connection waits until the first one is closed
+        second = socket.create_connection(("127.0.0.1", httpd.server_address[1]))
+        second.sendall("GET /Teams HTTP/1.1\r\n\r\n")
+        second.settimeout(0.3)
+        try:
+            second.recv(1)
+        except socket.timeout:
+            pass
+        else:
+            assert False, "the second connection was answered"
+
+        first.close()
+        second.settimeout(5)
+        assert 200 == read_responses(second, 1)[0][0]
+        second.close()
+    finally:
+        event_tear_down(httpd)
+
+def test_event_many_connections():
+    """
+    Keeps more connections open than select can watch and checks that
+    the server still answers on all of them.
+    """
+    count = 1100
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    # each connection takes a socket at each end
+    if hard != resource.RLIM_INFINITY and hard < 2*count + 100:
+        raise SkipTest("too few file descriptors allowed")
+    wanted = 4*count if hard == resource.RLIM_INFINITY else min(4*count, hard)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (max(soft, wanted), hard))
+    httpd = event_setup(max_connections=2*count)
+    socks = []
+    try:
+        for i in range(count):
+            sock = socket.create_connection(httpd.server_address, timeout=10)
+            socks.append(sock)
+        # the newest connections have the highest numbered sockets
+        for sock in socks[-20:] + socks[:5]:
+            sock.sendall("GET /Teams HTTP/1.1\r\nHost: x\r\n\r\n")
+            assert 200 == read_responses(sock, 1)[0][0]
+    finally:
+        for sock in socks: sock.close()
+        event_tear_down(httpd)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+def test_event_respond_error():
+    """
+    A response which can't be made closes the connection and prints
+    the error.
+    """
+    def respond(path, headers): raise ValueError("broken page")
+    httpd = event_server.EventServer(("127.0.0.1", 0), respond)
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={'poll_interval': 0.05})
+    thread.daemon = True
+    errors, sys.stderr = sys.stderr, StringIO.StringIO()
+    thread.start()
+    try:
+        sock = socket.create_connection(httpd.server_address, timeout=5)
+        sock.sendall("GET /Teams HTTP/1.1\r\nHost: x\r\n\r\n")
+        assert "" == sock.recv(1)
+        sock.close()
+    finally:
+        event_tear_down(httpd)
+        output, sys.stderr = sys.stderr.getvalue(), errors
+    assert "ValueError: broken page" in output, output
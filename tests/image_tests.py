@@ -0,0 +1,45 @@
+#!/usr/bin/python
+
+
+import sys, os, shutil, tempfile
+sys.path.append('..')
+import image_get as ig
+
+def test_logo_file():
+
+    assert "team_radicals_on.png" == ig.logo_file("Radicals")
+    assert "team_windchill_on.png" == ig.logo_file("Wind Chill")
+    # teams without an entry follow the same naming
+    assert "team_cannons_on.png" == ig.logo_file("Cannons")
+
+def test_AUDLlogo():
+
+    logo = ig.AUDLlogo("Radicals")
+
+    assert logo.startswith('\x89PNG')
+    assert logo is ig.AUDLlogo("Radicals")
+    assert "Not a valid team name" == ig.AUDLlogo("Ranchers")
+
+def test_logo_store_reload():
+
+    directory = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(directory, "team_radicals_on.png"), 'wb') as f:
+            f.write('\x89PNG radicals')
+        store = ig.LogoStore(directory, check_interval=0)
+
+        logo = store.get("Radicals")
+        assert '\x89PNG radicals' == logo.data
+        assert None == store.get("Cannons")
+        # logos that haven't changed aren't read again
+        assert logo is store.get("Radicals")
+
+        # a new logo is picked up without a new store
+        with open(os.path.join(directory, "team_cannons_on.png"), 'wb') as f:
+            f.write('\x89PNG cannons')
+        assert '\x89PNG cannons' == store.get("Cannons").data
+
+        os.remove(os.path.join(directory, "team_cannons_on.png"))
+        assert None == store.get("Cannons")
+    finally:
+        shutil.rmtree(directory)
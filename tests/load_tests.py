@@ -1,11 +1,15 @@
 #!/usr/bin/python 
 
 
-import sys, gc
+import sys, os, gc, time, threading, tempfile, shutil
 
 #Append the parent dir to the module search path
 sys.path.append('..')
+sys.path.append('../benchmarks')
 import AUDLclasses
+import statsapi
+import stand_in
+import synthetic
 
 def load_team_test():
     """
@@ -87,3 +91,85 @@ def test_match_games():
 
     assert test_game.home_score == 16, test_game.home_score
     assert test_game.away_score == 25, test_game.away_score
+
+def test_concurrent_add_teams():
+    """
+    Loads two teams against a slow stand-in for the ultimate-numbers server.
+    Each team makes three requests, so loading them one request at a time
+    takes six round trips. Fetching concurrently should take about two.
+    """
+    delay = 0.25
+    server = stand_in.StandInServer(delay=delay).start()
+    client = statsapi.client
+    statsapi.client = statsapi.StatsClient(server.url)
+    try:
+        test_league = AUDLclasses.League()
+        start = time.time()
+        test_league.add_teams('multiple_teams_info')
+        elapsed = time.time() - start
+    finally:
+        statsapi.client.close()
+        statsapi.client = client
+        server.stop()
+
+    assert 6 == server.requests, server.requests
+    assert elapsed < 4*delay, elapsed
+
+def test_fan_out():
+
+    # results come back in the order of the inputs
+    assert [0, 2, 4, 6] == AUDLclasses.fan_out(lambda x: 2*x, range(4))
+    assert [] == AUDLclasses.fan_out(lambda x: x, [])
+
+    # no more than the requested number of calls run at once
+    counts = {'active': 0, 'max': 0}
+    lock = threading.Lock()
+    def call(x):
+        with lock:
+            counts['active'] += 1
+            counts['max'] = max(counts['max'], counts['active'])
+        time.sleep(0.01)
+        with lock:
+            counts['active'] -= 1
+
+    AUDLclasses.fan_out(call, range(20), workers=3)
+    assert 3 >= counts['max'], counts['max']
+
+def test_fan_out_error():
+
+    def call(x):
+        if x == 3: raise ValueError("bad team")
+        return x
+
+    try:
+        AUDLclasses.fan_out(call, range(6))
+    except ValueError:
+        pass
+    else:
+        assert False, "fan_out did not raise the error from a call"
+
+def test_synthetic_league():
+    """
+    Builds a league from a synthetic season, without the internet, and
+    checks that every team, game and player in it was loaded.
+    """
+    season = synthetic.Season(teams=6, games=15, players=10)
+    directory = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    client = statsapi.client
+    try:
+        test_league = synthetic.build_league(season, directory)
+    finally:
+        os.chdir(cwd)
+        statsapi.client = client
+        shutil.rmtree(directory)
+
+    assert 6 == len(test_league.Teams)
+    assert 15 == len(test_league.Game_store.Games)
+    for team in test_league.Teams.values():
+        assert 10 == len(team.Players)
+        assert [] == team.Unmatched_players
+        # every team plays every other once in five rounds
+        assert 5 == len(team.Games)
+    # every game was given its score
+    assert 15 == sum(wins for wins, losses, diff in test_league.Records.values())
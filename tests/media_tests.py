@@ -4,6 +4,8 @@
 import sys
 sys.path.append('../')
 import MediaClasses as mc
+import youtube as yt
+import threading, time, pickle
 
 def videos_setup():
 
@@ -30,3 +32,244 @@ def test_video_refresh():
     assert list is type(test_vid_class.videos)
     assert 3 == len(test_vid_class.videos[0])
 
+
+class fake_feed():
+    """
+    Stands in for youtube.get_youtube, returning the videos it is given
+    and counting how many times it is called and the most calls at once.
+    """
+    def __init__(self, videos):
+        self.videos = videos
+        self.calls = 0
+        self.active = 0
+        self.most_active = 0
+        # clear to make the fetch wait until it is set
+        self.block = threading.Event()
+        self.block.set()
+
+    def __call__(self):
+        self.calls += 1
+        self.active += 1
+        self.most_active = max(self.most_active, self.active)
+        self.block.wait(5)
+        self.active -= 1
+        return list(self.videos)
+
+def test_videos_lazy():
+
+    feed = fake_feed([("Title", "url", "thumb")])
+    test_vid_class = mc.Videos(fetch=feed)
+
+    # nothing is fetched until the list is used
+    assert 0 == feed.calls
+    assert None == test_vid_class.Timestamp
+    assert [("Title", "url", "thumb")] == test_vid_class.videos
+    assert [("Title", "url", "thumb")] == test_vid_class.videos
+    assert 1 == feed.calls
+    assert test_vid_class.Timestamp != None
+
+def test_videos_stale():
+
+    feed = fake_feed([("Old", "url", "thumb")])
+    test_vid_class = mc.Videos(ttl=60, fetch=feed)
+    test_vid_class.refresh()
+    modified = test_vid_class.Last_modified
+
+    # once the list is out of date the old one is returned straight away
+    # while the new one is fetched
+    feed.videos = [("New", "url", "thumb")]
+    feed.block.clear()
+    test_vid_class.Timestamp -= 60
+    assert [("Old", "url", "thumb")] == test_vid_class.videos
+    assert [("Old", "url", "thumb")] == test_vid_class.videos
+    feed.block.set()
+    for i in range(50):
+        if not test_vid_class.refreshing: break
+        time.sleep(0.1)
+
+    # only one refresh was started
+    assert 2 == feed.calls
+    assert [("New", "url", "thumb")] == test_vid_class.videos
+    assert test_vid_class.Last_modified >= modified
+
+def test_videos_refresh_unchanged():
+
+    feed = fake_feed([("Title", "url", "thumb")])
+    test_vid_class = mc.Videos(fetch=feed)
+    assert test_vid_class.refresh()
+    modified = test_vid_class.Last_modified
+
+    assert not test_vid_class.refresh()
+    # a failed fetch keeps the list there was
+    feed.videos = []
+    assert not test_vid_class.refresh()
+    assert [("Title", "url", "thumb")] == test_vid_class.videos
+    assert modified == test_vid_class.Last_modified
+
+def test_videos_refresh_waits():
+
+    feed = fake_feed([("Old", "url", "thumb")])
+    test_vid_class = mc.Videos(ttl=60, fetch=feed)
+    test_vid_class.refresh()
+
+    # a refresh while a background one is fetching waits for it and
+    # uses its list instead of fetching at the same time
+    feed.videos = [("New", "url", "thumb")]
+    feed.block.clear()
+    test_vid_class.refresh_in_background()
+    for i in range(50):
+        if feed.active: break
+        time.sleep(0.1)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(test_vid_class.refresh()))
+    thread.start()
+    time.sleep(0.2)
+    feed.block.set()
+    thread.join(5)
+
+    assert [True] == results
+    assert 1 == feed.most_active
+    assert 2 == feed.calls
+    assert [("New", "url", "thumb")] == test_vid_class.videos
+
+def test_videos_pickle():
+
+    test_vid_class = mc.Videos()
+    test_vid_class.videos = [("Title", "url", "thumb")]
+    copy = pickle.loads(pickle.dumps(test_vid_class, pickle.HIGHEST_PROTOCOL))
+
+    assert [("Title", "url", "thumb")] == copy._videos
+    assert test_vid_class.Timestamp == copy.Timestamp
+    assert copy.fetch_lock.acquire(False)
+
+class fake_channel():
+    """
+    Stands in for youtube.get_page, serving pages of a channel with the
+    given number of videos and recording the start of each page asked for.
+    """
+    def __init__(self, count):
+        self.count = count
+        self.starts = []
+
+    def video(self, n):
+        link = 'http://www.youtube.com/watch?v=%011d&feature=youtube_gdata' % n
+        return {'title': {'$t': 'Video %d' % n}, 'link': [{'href': link}]}
+
+    def __call__(self, start, author):
+        self.starts.append(start)
+        # newest first, so the highest numbered video is at index 1
+        numbers = range(self.count, 0, -1)[start-1:start-1+yt.page_size]
+        return {'openSearch$totalResults': {'$t': str(self.count)},
+                'entry': [self.video(n) for n in numbers]}
+
+def test_channel_resync():
+
+    feed = fake_channel(120)
+    channel = yt.Channel(get_page=feed)
+    videos = channel.sync()
+
+    assert 120 == len(videos)
+    assert [1, 51, 101] == sorted(feed.starts)
+    assert ('Video 120', 'http://www.youtube.com/watch?v=00000000120&feature=youtube_gdata',
+            'http://i.ytimg.com/vi/00000000120/0.jpg') == videos[0]
+    assert 'Video 1' == videos[-1][0]
+
+def test_channel_incremental():
+
+    feed = fake_channel(120)
+    channel = yt.Channel(get_page=feed)
+    channel.sync()
+
+    # nothing new costs a single page
+    feed.starts = []
+    assert 120 == len(channel.sync())
+    assert [1] == feed.starts
+
+    # new videos are added to the front without reading the whole channel
+    feed.count = 175
+    feed.starts = []
+    videos = channel.sync()
+    assert [1, 51] == feed.starts
+    assert 175 == len(videos)
+    assert ['Video %d' % n for n in range(175, 0, -1)] == [video[0] for video in videos]
+
+def test_channel_resync_every():
+
+    feed = fake_channel(10)
+    channel = yt.Channel(resync_every=2, get_page=feed)
+    for i in range(4): channel.sync()
+
+    # a full resync, two updates and another full resync
+    assert 0 == channel.syncs
+
+def test_channel_error():
+
+    feed = fake_channel(10)
+    channel = yt.Channel(get_page=feed)
+    videos = channel.sync()
+
+    def broken(start, author): raise IOError("no connection")
+    channel.get_page = broken
+    assert videos == channel.sync()
+
+class fake_entry(dict):
+    """
+    Stands in for a feedparser entry.
+    """
+    __getattr__ = dict.__getitem__
+
+def news_entry(n, published):
+    return fake_entry(id='http://x/%d' % n, link='http://x/%d' % n, title='Article %d' % n,
+                      published=published)
+
+def test_article_date():
+
+    article = mc.Article('Mon, 05 May 2014 10:00:00 GMT', 'http://x/1', 'Title')
+    assert mc.datetime(2014, 5, 5, 10) == article.Date
+    assert ('Title', 'http://x/1', '05 May 2014') == article.page_info()
+    assert mc.datetime.min == mc.Article('sometime', 'http://x/1', 'Title').Date
+
+def test_news_store_merge():
+
+    store = mc.NewsStore()
+    entries = [news_entry(1, 'Mon, 05 May 2014 10:00:00 GMT'),
+               news_entry(2, 'Tue, 06 May 2014 10:00:00 GMT')]
+    assert 2 == store.merge(entries)
+    # the same entries again add nothing
+    assert 0 == store.merge(entries)
+    assert 1 == store.merge(entries + [news_entry(3, 'Sun, 04 May 2014 10:00:00 GMT')])
+
+    assert ['Article 2', 'Article 1', 'Article 3'] == [row[0] for row in store.Page]
+    assert 3 == len(store.Articles)
+
+def test_news_store_bounded():
+
+    store = mc.NewsStore(max_articles=2)
+    store.merge([news_entry(1, 'Mon, 05 May 2014 10:00:00 GMT'),
+                 news_entry(2, 'Tue, 06 May 2014 10:00:00 GMT'),
+                 news_entry(3, 'Wed, 07 May 2014 10:00:00 GMT')])
+    assert ['http://x/3', 'http://x/2'] == [row[1] for row in store.Page]
+
+    # articles older than the store holds aren't added back
+    assert 0 == store.merge([news_entry(1, 'Mon, 05 May 2014 10:00:00 GMT')])
+    assert ['http://x/2', 'http://x/3'] == sorted(store.Articles)
+
+def test_news_store_fetch():
+
+    store = mc.NewsStore()
+    calls = []
+    def parse(url, etag=None, modified=None):
+        calls.append((url, etag, modified))
+        if etag == '"v1"': return fake_entry(status=304, entries=[])
+        return fake_entry(status=200, etag='"v1"', modified=None,
+                          entries=[news_entry(1, 'Mon, 05 May 2014 10:00:00 GMT')])
+
+    real_parse = mc.fp.parse
+    mc.fp.parse = parse
+    try:
+        assert 1 == len(store.fetch('http://feed'))
+        # the second fetch sends the feed's etag back and gets nothing new
+        assert [] == store.fetch('http://feed')
+    finally:
+        mc.fp.parse = real_parse
+    assert [('http://feed', None, None), ('http://feed', '"v1"', None)] == calls
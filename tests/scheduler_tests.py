@@ -0,0 +1,118 @@
+#!/usr/bin/python
+
+
+import sys
+sys.path.append('..')
+import scheduler
+import threading, time
+
+class test_clock():
+    """
+    A clock which only moves when told to.
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_run_pending():
+
+    clock = test_clock()
+    test_scheduler = scheduler.Scheduler(clock)
+    runs = []
+    test_scheduler.add("fast", lambda: runs.append("fast"), 10)
+    test_scheduler.add("slow", lambda: runs.append("slow"), 60, delay=0)
+
+    assert 1 == test_scheduler.run_pending()
+    assert ["slow"] == runs
+    assert 0 == test_scheduler.run_pending()
+
+    clock.now += 10
+    assert 1 == test_scheduler.run_pending()
+    clock.now += 50
+    # both are due, the one which came due first runs first
+    assert 2 == test_scheduler.run_pending()
+    assert ["slow", "fast", "fast", "slow"] == runs
+
+    stats = test_scheduler.stats()
+    assert 2 == stats["fast"]['runs']
+    assert 1060 == stats["slow"]['last_run']
+    assert 1120 == stats["slow"]['next_run']
+
+def test_job_errors():
+
+    clock = test_clock()
+    test_scheduler = scheduler.Scheduler(clock)
+    test_scheduler.add("broken", lambda: 1/0, 10, delay=0)
+
+    test_scheduler.run_pending()
+    clock.now += 10
+    test_scheduler.run_pending()
+
+    stats = test_scheduler.stats()["broken"]
+    assert 2 == stats['runs']
+    assert 2 == stats['errors']
+    assert stats['last_error'].startswith("ZeroDivisionError")
+
+def test_slow_job_coalesced():
+
+    clock = test_clock()
+    test_scheduler = scheduler.Scheduler(clock)
+
+    def slow():
+        # the run takes three and a half intervals
+        clock.now += 35
+    test_scheduler.add("slow", slow, 10, delay=0)
+    test_scheduler.run_pending()
+
+    stats = test_scheduler.stats()["slow"]
+    assert 35 == stats['duration']
+    # the runs which came due while it was going are folded into the next
+    assert 3 == stats['coalesced']
+    assert 1040 == stats['next_run']
+
+def test_trigger():
+
+    clock = test_clock()
+    test_scheduler = scheduler.Scheduler(clock)
+    test_scheduler.add("job", lambda: None, 60)
+
+    test_scheduler.trigger("job")
+    test_scheduler.trigger("job")
+    assert 1 == test_scheduler.run_pending()
+    assert 0 == test_scheduler.run_pending()
+    assert 1 == test_scheduler.stats()["job"]['coalesced']
+
+def test_scheduler_thread():
+    """
+    Triggers a job many times while it is running on the scheduler thread.
+    """
+    test_scheduler = scheduler.Scheduler()
+    started = threading.Event()
+    release = threading.Event()
+    running = []
+
+    def job():
+        running.append(1)
+        assert 1 == len(running), "the job overlapped with itself"
+        started.set()
+        release.wait(5)
+        running.pop()
+
+    test_scheduler.add("job", job, 60, delay=0)
+    test_scheduler.start()
+    try:
+        assert started.wait(5)
+        started.clear()
+        for i in range(5): test_scheduler.trigger("job")
+        release.set()
+        # the triggers make a single run
+        assert started.wait(5)
+        time.sleep(0.1)
+    finally:
+        test_scheduler.stop()
+
+    stats = test_scheduler.stats()["job"]
+    assert 2 == stats['runs'], stats
+    assert 4 == stats['coalesced'], stats
@@ -0,0 +1,435 @@
+#!/usr/bin/python
+
+
+import sys
+sys.path.append('..')
+import server
+import threading, httplib, gzip, zlib, StringIO, SocketServer
+import os, signal, tempfile, time
+
+class cache_test_league():
+    """
+    A minimal stand-in for the League class which counts how many
+    times its team list is built.
+    """
+    def __init__(self):
+        self.Generation = 0
+        self.Last_update = 1400000000
+        self.Teams = {}
+        self.builds = 0
+        # the number of teams in the list
+        self.size = 1
+
+    def team_list(self):
+        self.builds += 1
+        return [("Madison Radicals", 224002, self.Generation)]*self.size
+
+    # the other pages of the app are empty
+    def news_page_info(self): return []
+    def standings(self): return []
+    def return_scores_page(self): return []
+    def return_schedules(self): return []
+    def get_videos(self): return []
+    def get_top_fives(self): return []
+    def videos_modified(self): return None
+
+    # and refreshing it changes nothing
+    def update_live_games(self): pass
+    def update_games(self): pass
+    def get_news(self): pass
+    def update_videos(self): pass
+
+class cache_test_team():
+    """
+    A minimal stand-in for the Team class with an empty team page.
+    """
+    def __init__(self, name):
+        self.Name = name
+        self.Top_Fives = []
+
+    def roster(self): return []
+    def return_schedule(self): return []
+
+def test_response_cache_hit():
+
+    test_league = cache_test_league()
+    test_cache = server.ResponseCache()
+
+    first = test_cache.get("/Teams", test_league)
+    # a trailing slash should map to the same entry
+    second = test_cache.get("/Teams/", test_league)
+
+    assert first is second
+    assert 1 == test_league.builds, test_league.builds
+
+def test_response_cache_refresh():
+
+    test_league = cache_test_league()
+    test_cache = server.ResponseCache()
+
+    first = test_cache.get("/Teams", test_league)
+
+    # a refresh bumps the generation, the old entry must not be served
+    test_league.Generation += 1
+    second = test_cache.get("/Teams", test_league)
+
+    assert first.body != second.body
+    assert 2 == test_league.builds, test_league.builds
+
+def test_response_cache_keys():
+
+    test_league = cache_test_league()
+    test_cache = server.ResponseCache()
+
+    assert "Teams" == test_cache.cache_key("/Teams", test_league)
+    assert None == test_cache.cache_key("/Icons/224002", test_league)
+    assert None == test_cache.cache_key("/Nonsense", test_league)
+    # unknown teams are not cached
+    assert None == test_cache.cache_key("/Teams/224002", test_league)
+    test_league.Teams[224002] = None
+    assert "Teams/224002" == test_cache.cache_key("/Teams/224002", test_league)
+    assert "Teams/224002" == test_cache.cache_key("/Teams/224002/Roster", test_league)
+
+def test_not_modified():
+
+    test_league = cache_test_league()
+    test_cache = server.ResponseCache()
+    response = test_cache.get("/Teams", test_league)
+
+    assert response.etag.startswith('"') and response.etag.endswith('"')
+    assert 1400000000 == response.last_modified
+
+    assert False == response.not_modified({})
+    assert True == response.not_modified({'If-None-Match': response.etag})
+    assert True == response.not_modified({'If-None-Match': '"other", ' + response.etag})
+    assert True == response.not_modified({'If-None-Match': '*'})
+    assert False == response.not_modified({'If-None-Match': '"other"'})
+
+    assert True == response.not_modified({'If-Modified-Since': 'Tue, 13 May 2014 16:53:20 GMT'})
+    assert False == response.not_modified({'If-Modified-Since': 'Tue, 13 May 2014 16:53:19 GMT'})
+    assert False == response.not_modified({'If-Modified-Since': 'yesterday'})
+    # If-None-Match wins over If-Modified-Since
+    assert False == response.not_modified({'If-None-Match': '"other"',
+                                           'If-Modified-Since': 'Tue, 13 May 2014 16:53:20 GMT'})
+
+    # a refresh which changes the page changes its etag
+    test_league.Generation += 1
+    assert False == test_cache.get("/Teams", test_league).not_modified({'If-None-Match': response.etag})
+
+def test_choose_encoding():
+
+    assert 'identity' == server.choose_encoding('')
+    assert 'gzip' == server.choose_encoding('gzip, deflate')
+    assert 'deflate' == server.choose_encoding('deflate')
+    assert 'deflate' == server.choose_encoding('gzip;q=0.5, deflate')
+    assert 'identity' == server.choose_encoding('gzip;q=0, br')
+    assert 'gzip' == server.choose_encoding('*')
+    assert 'gzip' == server.choose_encoding('GZIP ; q=1.0')
+
+def test_compressed_variants():
+
+    test_league = cache_test_league()
+    test_league.size = 50
+    test_cache = server.ResponseCache()
+    response = test_cache.get("/Teams", test_league)
+
+    gzipped = response.encode('gzip')
+    assert response.body == gzip.GzipFile(fileobj=StringIO.StringIO(gzipped)).read()
+    assert response.body == zlib.decompress(response.encode('deflate'))
+    assert len(gzipped) < len(response.body)
+    # the compressed body is only made once
+    assert gzipped is response.encode('gzip')
+
+    # each coding has its own entity tag
+    assert 3 == len(set([response.entity_tag(), response.entity_tag('gzip'), response.entity_tag('deflate')]))
+    assert True == response.not_modified({'If-None-Match': response.entity_tag('gzip')}, 'gzip')
+    assert False == response.not_modified({'If-None-Match': response.entity_tag('gzip')})
+
+    # short responses aren't compressed
+    test_league.size = 1
+    test_league.Generation += 1
+    assert 'identity' == test_cache.get("/Teams", test_league).negotiate('gzip')
+
+def test_videos_last_modified():
+
+    test_league = cache_test_league()
+    test_cache = server.ResponseCache()
+
+    # the videos page changes when the videos do, the others with the league
+    assert 1400000000 == test_cache.get("/Videos", test_league).last_modified
+    test_league.Generation += 1
+    test_league.videos_modified = lambda: 1300000000
+    assert 1300000000 == test_cache.get("/Videos", test_league).last_modified
+    assert 1400000000 == test_cache.get("/Home", test_league).last_modified
+
+def test_snapshot():
+
+    test_league = cache_test_league()
+    test_league.Teams[224002] = cache_test_team("Radicals")
+    test_cache = server.ResponseCache()
+    snapshot = server.Snapshot(test_league, test_cache)
+
+    # every page is built up front
+    assert 1 == test_league.builds
+    assert test_cache.get("/Teams", test_league) is snapshot.get("/Teams/")
+    assert '[[], [], []]' == snapshot.get("/Teams/224002").body
+    assert "Not a valid path" == snapshot.get("/Teams/1").body
+    assert "Not a valid path" == snapshot.get("/Nonsense").body
+    assert {224002: "Radicals"} == snapshot.Teams
+
+    # a refresh doesn't change a snapshot which has already been built
+    test_league.Generation += 1
+    test_league.Teams[1] = cache_test_team("Rush")
+    newer = server.Snapshot(test_league, test_cache)
+    assert snapshot.get("/Teams").body != newer.get("/Teams").body
+    assert "Not a valid path" == snapshot.get("/Teams/1").body
+    assert 0 == snapshot.generation and 1 == newer.generation
+
+def test_refresh_job():
+
+    test_league = cache_test_league()
+    snapshot = server.snapshot
+    try:
+        # nothing is published if the league didn't change
+        server.refresh_job(test_league, lambda: None)()
+        assert snapshot is server.snapshot
+
+        def update(): test_league.Generation += 1
+        server.refresh_job(test_league, update)()
+        assert 1 == server.snapshot.generation
+    finally:
+        server.snapshot = snapshot
+
+def test_log_stats():
+
+    test_league = cache_test_league()
+    test_league.update_live_games = test_league.update_games = lambda: 1/0
+    test_league.get_news = test_league.update_videos = lambda: None
+    refresher = server.refresh_scheduler(test_league, refresh_now=True)
+    refresher.run_pending()
+
+    output, sys.stdout = sys.stdout, StringIO.StringIO()
+    try:
+        server.log_stats(refresher)
+        lines = sys.stdout.getvalue().splitlines()
+    finally:
+        sys.stdout = output
+    assert 5 == len(lines), lines
+    assert lines[0].startswith("games: 1 runs, 1 errors"), lines
+    assert lines[0].endswith("last error: ZeroDivisionError: integer division or modulo by zero")
+    assert lines[1].startswith("live games: not run yet"), lines
+
+def test_mapped_snapshot():
+
+    test_league = cache_test_league()
+    test_league.size = 50
+    test_league.Teams[224002] = cache_test_team("Radicals")
+    snapshot = server.Snapshot(test_league, server.ResponseCache())
+    path = tempfile.mktemp()
+    try:
+        server.write_snapshot(snapshot, path)
+        mapped = server.MappedSnapshot(*server.snapshot_file.read(path))
+    finally:
+        os.remove(path)
+
+    assert {224002: "Radicals"} == mapped.Teams
+    # the mapped snapshot gives the same responses as the one it was written from
+    for path, request_headers in [("/Teams", {}), ("/Teams", {'Accept-Encoding': 'gzip'}),
+                                  ("/Teams/224002", {}), ("/Nonsense", {}), ("/Icons/224002", {}),
+                                  ("/Teams", {'If-None-Match': snapshot.get("/Teams").etag})]:
+        status, headers, body = server.respond(path, request_headers, snapshot)
+        mapped_status, mapped_headers, mapped_body = server.respond(path, request_headers, mapped)
+        assert (status, headers, body) == (mapped_status, mapped_headers, str(mapped_body)), path
+
+def test_prefork_workers():
+
+    test_league = cache_test_league()
+    path = tempfile.mktemp()
+    listener = server.make_listener(("127.0.0.1", 0))
+    # the workers wait for the snapshot file to be written
+    pids = server.start_workers(listener, 2, path)
+    try:
+        conn = httplib.HTTPConnection("127.0.0.1", listener.getsockname()[1], timeout=5)
+        conn.request("GET", "/Teams")
+        response = conn.getresponse()
+        assert 503 == response.status
+        response.read()
+
+        server.write_snapshot(server.Snapshot(test_league, server.ResponseCache()), path)
+        time.sleep(0.6)
+        for i in range(4):
+            conn = httplib.HTTPConnection("127.0.0.1", listener.getsockname()[1], timeout=5)
+            conn.request("GET", "/Teams")
+            response = conn.getresponse()
+            assert 200 == response.status
+            assert '[["Madison Radicals", 224002, 0]]' == response.read()
+            conn.close()
+    finally:
+        for pid in pids:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+        listener.close()
+        if os.path.exists(path): os.remove(path)
+
+def test_warm_start():
+
+    test_league = cache_test_league()
+    test_league.Generation = 5
+    saved = server.AUDL, server.snapshot, server.state_path
+    server.state_path = tempfile.mktemp()
+    try:
+        server.AUDLclasses.save_league(test_league, server.state_path)
+        assert True == server.start_league()
+        assert 5 == server.AUDL.Generation
+        assert 5 == server.snapshot.generation
+
+        # publishing saves the league again
+        server.AUDL.Generation += 1
+        server.publish(server.AUDL)
+        assert 6 == server.AUDLclasses.load_league(server.state_path).Generation
+    finally:
+        os.remove(server.state_path)
+        server.AUDL, server.snapshot, server.state_path = saved
+
+def test_publish_unsaved():
+
+    test_league = cache_test_league()
+    saved = server.snapshot, server.state_path
+    server.state_path = os.path.join(tempfile.mktemp(), "league")
+    output, sys.stdout = sys.stdout, StringIO.StringIO()
+    try:
+        # a state file which can't be written doesn't stop the league being served
+        server.publish(test_league)
+        assert 0 == server.snapshot.generation
+        assert sys.stdout.getvalue().startswith("Couldn't save the league")
+    finally:
+        sys.stdout = output
+        server.snapshot, server.state_path = saved
+
+def test_league_owner():
+
+    test_league = cache_test_league()
+    test_league.Generation = 3
+    saved = server.state_path
+    server.state_path = tempfile.mktemp()
+    path = tempfile.mktemp()
+    listener = server.make_listener(("127.0.0.1", 0))
+    try:
+        server.AUDLclasses.save_league(test_league, server.state_path)
+        # the owner loads the league in its own process and writes the
+        # snapshot file for the workers
+        pid = server.start_owner(listener, path)
+        for i in range(50):
+            if os.path.exists(path): break
+            time.sleep(0.1)
+        assert 3 == server.snapshot_file.read(path)[0]
+        # this process never built a league
+        assert None == server.AUDL
+    finally:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+        listener.close()
+        os.remove(server.state_path)
+        if os.path.exists(path): os.remove(path)
+        server.state_path = saved
+
+class QuietHandler(server.Handler):
+    def log_message(self, format, *args): pass
+
+def handler_setup():
+    """
+    Starts a server on a free port for the snapshot in server.snapshot.
+    """
+    httpd = SocketServer.ThreadingTCPServer(("127.0.0.1", 0), QuietHandler)
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return httpd
+
+def test_handler_headers():
+    """
+    Requests a page from a running server over a single connection.
+    """
+    test_league = cache_test_league()
+    test_league.size = 50
+    snapshot, server.snapshot = server.snapshot, server.Snapshot(test_league, server.ResponseCache())
+    httpd = handler_setup()
+    try:
+        conn = httplib.HTTPConnection("127.0.0.1", httpd.server_address[1])
+        conn.request("GET", "/Teams", headers={'Accept-Encoding': 'gzip'})
+        response = conn.getresponse()
+        body = response.read()
+
+        assert 200 == response.status
+        assert 'application/json' == response.getheader('Content-Type')
+        assert 'gzip' == response.getheader('Content-Encoding')
+        assert 'Accept-Encoding' == response.getheader('Vary')
+        assert len(body) == int(response.getheader('Content-Length'))
+
+        # the same connection is used again for a conditional request
+        conn.request("GET", "/Teams", headers={'Accept-Encoding': 'gzip',
+                                               'If-None-Match': response.getheader('ETag')})
+        response = conn.getresponse()
+        assert 304 == response.status
+        assert '' == response.read()
+        conn.close()
+    finally:
+        server.snapshot = snapshot
+        httpd.shutdown()
+        httpd.server_close()
+
+def test_handler_idle_timeout():
+    """
+    Leaves a kept-alive connection idle until the server closes it.
+    """
+    test_league = cache_test_league()
+    snapshot, server.snapshot = server.snapshot, server.Snapshot(test_league, server.ResponseCache())
+    timeout, QuietHandler.timeout = QuietHandler.timeout, 0.2
+    httpd = handler_setup()
+    try:
+        conn = httplib.HTTPConnection("127.0.0.1", httpd.server_address[1], timeout=5)
+        conn.request("GET", "/Teams")
+        response = conn.getresponse()
+        response.read()
+        assert not response.will_close
+        # the server hangs up once the connection has been idle too long
+        time.sleep(0.5)
+        assert "" == conn.sock.recv(1)
+        conn.close()
+    finally:
+        QuietHandler.timeout = timeout
+        server.snapshot = snapshot
+        httpd.shutdown()
+        httpd.server_close()
+
+def test_handler_icons():
+
+    test_league = cache_test_league()
+    test_league.Teams[224002] = cache_test_team("Radicals")
+    snapshot, server.snapshot = server.snapshot, server.Snapshot(test_league, server.ResponseCache())
+    httpd = handler_setup()
+    try:
+        conn = httplib.HTTPConnection("127.0.0.1", httpd.server_address[1])
+        conn.request("GET", "/Icons/224002")
+        response = conn.getresponse()
+        body = response.read()
+
+        assert 200 == response.status
+        assert 'image/png' == response.getheader('Content-Type')
+        assert server.ig.AUDLlogo("Radicals") == body
+        assert 'max-age' in response.getheader('Cache-Control')
+
+        conn.request("GET", "/Icons/224002", headers={'If-None-Match': response.getheader('ETag')})
+        response = conn.getresponse()
+        assert 304 == response.status
+        response.read()
+
+        conn.request("GET", "/Icons/1")
+        response = conn.getresponse()
+        assert 404 == response.status
+        response.read()
+        conn.close()
+    finally:
+        server.snapshot = snapshot
+        httpd.shutdown()
+        httpd.server_close()
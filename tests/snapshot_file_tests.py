@@ -0,0 +1,81 @@
+#!/usr/bin/python
+
+
+import sys
+sys.path.append('..')
+import snapshot_file
+import os, tempfile, time, shutil
+
+def test_snapshot_file_round_trip():
+
+    path = tempfile.mktemp()
+    pages = { 'Teams': ("application/json", '"abc"', 1400000000, {'identity': '[1, 2]', 'gzip': 'zipped'}),
+              None: ("text/plain", '"def"', 1400000000, {'identity': 'Not a valid path'}) }
+    try:
+        snapshot_file.write(path, 7, {224002: "Radicals"}, pages)
+        generation, teams, read_pages = snapshot_file.read(path)
+    finally:
+        os.remove(path)
+
+    assert 7 == generation
+    assert {224002: "Radicals"} == teams
+    assert set(['Teams', None]) == set(read_pages)
+    content_type, etag, last_modified, encoded = read_pages['Teams']
+    assert ("application/json", '"abc"', 1400000000) == (content_type, etag, last_modified)
+    # the bodies are read straight from the mapped file
+    assert type(encoded['identity']) is buffer
+    assert '[1, 2]' == str(encoded['identity'])
+    assert 'zipped' == str(encoded['gzip'])
+
+def test_snapshot_file_reader():
+
+    path = tempfile.mktemp()
+    reader = snapshot_file.Reader(path, lambda generation, teams, pages: generation, check_interval=0)
+    try:
+        # there isn't a file yet
+        assert None == reader.get()
+
+        snapshot_file.write(path, 1, {}, {})
+        assert 1 == reader.get()
+        snapshot_file.write(path, 2, {}, {})
+        assert 2 == reader.get()
+
+        # the file isn't checked again until check_interval has passed
+        reader.check_interval = 60
+        snapshot_file.write(path, 3, {}, {})
+        assert 2 == reader.get()
+        reader.last_check -= 60
+        assert 3 == reader.get()
+    finally:
+        os.remove(path)
+
+def test_not_snapshot_file():
+
+    path = tempfile.mktemp()
+    with open(path, 'wb') as f:
+        f.write("this is not a snapshot file at all")
+    try:
+        snapshot_file.read(path)
+    except snapshot_file.SnapshotFileError:
+        pass
+    else:
+        assert False, "no error was raised"
+    finally:
+        os.remove(path)
+
+def test_write_private_temp():
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "snapshot")
+    # a link planted at the old, predictable temporary name isn't followed
+    target = os.path.join(directory, "target")
+    open(target, 'w').write("keep")
+    os.symlink(target, "%s.%d.tmp" % (path, os.getpid()))
+    try:
+        snapshot_file.write(path, 1, {}, {})
+        assert "keep" == open(target).read()
+        assert 1 == snapshot_file.read(path)[0]
+        # only the snapshot, the target and the link are left
+        assert 3 == len(os.listdir(directory))
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,89 @@
+#!/usr/bin/python
+
+"""
+A local stand-in for the ultimate-numbers server used by the tests.
+
+It answers every GET request with the json data registered for that path
+(an empty list by default) after an optional delay, and keeps count of
+the requests it has served and the connections opened to it. Connections
+are kept alive between requests. It can also send entity tags and answer
+conditional requests with 304 Not Modified.
+"""
+
+import SocketServer, BaseHTTPServer
+import threading, json, time, hashlib
+
+class StandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            failed = server.failures > 0
+            if failed: server.failures -= 1
+        time.sleep(server.delay)
+
+        body = json.dumps(server.payloads.get(self.path, []))
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if server.etags and not failed and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        else:
+            self.send_response(503 if failed else 200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if server.etags: self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        with server.lock:
+            server.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+class StandInServer(SocketServer.ThreadingTCPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, delay=0, payloads=None):
+        SocketServer.ThreadingTCPServer.__init__(self, ("127.0.0.1", 0), StandInHandler)
+        # seconds to wait before answering each request
+        self.delay = delay
+        # A dictionary of the json data to return
+        # Keys: request paths Values: python objects
+        self.payloads = payloads if payloads != None else {}
+        # number of requests still to be answered with 503 Service Unavailable
+        self.failures = 0
+        # whether responses carry entity tags
+        self.etags = False
+        # counts of the connections opened and the requests served and in progress
+        self.connections = 0
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        # The base url the stand-in is serving at
+        self.url = "http://127.0.0.1:%d" % self.server_address[1]
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        SocketServer.ThreadingTCPServer.process_request(self, request, client_address)
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,105 @@
+#!/usr/bin/python
+
+
+import sys
+sys.path.append('..')
+import statsapi
+import AUDLclasses
+import stand_in
+
+def client_setup(**kwargs):
+    """
+    Starts a stand-in server and a client for it.
+    """
+    server = stand_in.StandInServer(payloads={'/rest/view/team/224002/games': [{'ours': 25}]}).start()
+    return server, statsapi.StatsClient(server.url + "/rest/view", **kwargs)
+
+def client_tear_down(server, client):
+
+    client.close()
+    server.stop()
+
+def test_client_reuses_connection():
+
+    server, client = client_setup()
+    try:
+        for i in range(10):
+            assert [] == client.get_json("/team/224002/players/")
+    finally:
+        client_tear_down(server, client)
+
+    assert 10 == server.requests, server.requests
+    assert 1 == server.connections, server.connections
+    assert 10 == client.stats()['requests']
+    assert 10 == sum(count for bound, count in client.stats()['latencies'])
+
+def test_client_pool_size():
+
+    server, client = client_setup(pool_size=3)
+    server.delay = 0.02
+    try:
+        AUDLclasses.fan_out(lambda i: client.get_json("/team/224002/games"), range(30), workers=8)
+    finally:
+        client_tear_down(server, client)
+
+    assert 30 == server.requests, server.requests
+    assert 3 >= server.connections, server.connections
+    assert 3 >= server.max_active, server.max_active
+
+def test_client_retries():
+
+    server, client = client_setup(backoff=0.01)
+    server.failures = 2
+    try:
+        assert [{'ours': 25}] == client.get_json("/team/224002/games")
+    finally:
+        client_tear_down(server, client)
+
+    assert 3 == server.requests, server.requests
+    assert 2 == client.stats()['retries']
+    assert 0 == client.stats()['errors']
+
+def test_client_gives_up():
+
+    server, client = client_setup(retries=1, backoff=0.01)
+    server.failures = 5
+    try:
+        client.get_json("/team/224002/games")
+    except statsapi.StatsError:
+        pass
+    else:
+        assert False, "the client did not raise an error"
+    finally:
+        client_tear_down(server, client)
+
+    assert 2 == server.requests, server.requests
+    assert 1 == client.stats()['errors']
+
+def test_client_not_modified():
+
+    server, client = client_setup()
+    server.etags = True
+    try:
+        first = client.get_json("/team/224002/games")
+        # the server answers 304 and the client hands back the same list
+        assert first is client.get_json("/team/224002/games")
+        server.payloads['/rest/view/team/224002/games'] = [{'ours': 26}]
+        second = client.get_json("/team/224002/games")
+    finally:
+        client_tear_down(server, client)
+
+    assert [{'ours': 26}] == second
+    assert 1 == client.stats()['not_modified']
+
+def test_client_unchanged():
+
+    server, client = client_setup()
+    try:
+        first = client.get_json("/team/224002/games")
+        # no entity tags, but the body is the same as last time
+        assert first is client.get_json("/team/224002/games")
+    finally:
+        client_tear_down(server, client)
+
+    assert 1 == client.stats()['unchanged']
+    assert 0 == client.stats()['not_modified']
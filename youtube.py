@@ -1,6 +1,9 @@
 #__author__ = 'Corey'
 
-import urllib, json
+import urllib, json, threading
+
+# Number of videos asked for in each page of the channel's feed
+page_size = 50
 
 #want to return a string like this http://i.ytimg.com/vi/(link substring)/0.jpg
 def get_thumbnail( link ):
@@ -10,44 +13,141 @@ def get_thumbnail( link ):
     link = base + link + end
     return link
 
-#returns a list of the videos on the AUDL Channel with each list having 1. title, 2. url, 3.jpeg
-def get_youtube( ):
-    author = 'TheAUDLChannel'
+#returns the feed of the page of the author's videos starting at start_index (counting from 1), newest first
+def get_page( start_index, author = 'TheAUDLChannel' ):
+    inp = urllib.urlopen( r'http://gdata.youtube.com/feeds/api/videos?start-index={0}&max-results={1}&alt=json&orderby=published&author={2}'.format( start_index, page_size, author ) )
+    try:
+        return json.load(inp)['feed']
+    finally:
+        inp.close()
 
-    foundAll = False
-
-    i = 1
-    vids = []
+#returns the title, url and thumbnail of each video in a page of the feed
+def page_videos( feed ):
     vidList = []
-    while not foundAll:
-        inp = urllib.urlopen( r'http://gdata.youtube.com/feeds/api/videos?start-index={0}&max-results=50&alt=json&orderby=published&author={1}'.format( i, author ) )
-        try:
-            resp = json.load(inp)
-            inp.close()
-            retVids = resp['feed']['entry']
-            for video in retVids:
-                vids.append( video )
-
-            i += 50
-            if ( len( retVids ) < 50 ):
-                foundAll = True
-
-        except:
-            print "error"
-            foundAll = True
-
-    for video in vids:
-        #title = video['title']['$t']
-        #link = video['link'][0]['href']
-        #image = get_thumbnail(video['link'][0]['href'])
-        video_up = ( video['title']['$t'], video['link'][0]['href'], get_thumbnail( video['link'][0]['href'] ) )
-        vidList.append( video_up )
-
+    for video in feed.get('entry', []):
+        link = video['link'][0]['href']
+        vidList.append( ( video['title']['$t'], link, get_thumbnail( link ) ) )
     return vidList
-    
-#list begins at index 0 with the most recent video 
+
+class Channel():
+    """
+    Keeps the list of videos on a YouTube channel up to date.
+
+    A sync only asks for the newest pages of the channel, stopping at the
+    first page with a video it already has, so it costs one request when
+    nothing has been posted. Every resync_every syncs (and the first) the
+    whole channel is read again, the pages after the first all at once,
+    so that deleted and renamed videos are picked up.
+    """
+    def __init__(self, author = 'TheAUDLChannel', resync_every = 24, get_page = get_page):
+        # The name of the channel's author
+        self.author = author
+        # Number of syncs between full resyncs
+        self.resync_every = resync_every
+        # The function which fetches a page of the feed
+        # (given the start index and author)
+        self.get_page = get_page
+        # A list of (title, url, thumbnail url) tuples, newest first
+        self.videos = []
+        # The urls of the videos in the list, which identify them
+        self.known = set()
+        # Number of syncs since the last full resync (None before the first)
+        self.syncs = None
+        # Held during a sync, since the list is shared by every caller
+        self.lock = threading.Lock()
+
+    def sync( self ):
+        """
+        Brings the list up to date and returns a copy of it. If a page
+        can't be fetched the list is left as it was. Syncs run one at a time.
+        """
+        with self.lock:
+            try:
+                if self.syncs is None or self.syncs >= self.resync_every:
+                    self.resync()
+                else:
+                    self.update()
+                    self.syncs += 1
+            except Exception, e:
+                print "error fetching videos -", e
+            return list( self.videos )
+
+    def update( self ):
+        """
+        Adds the videos posted since the last sync to the front of the list.
+        """
+        new = []
+        start = 1
+        while True:
+            page = page_videos( self.get_page( start, self.author ) )
+            for video in page:
+                # the feed is newest first, so everything from here on is known
+                if video[1] in self.known:
+                    self.add( new )
+                    return
+                new.append( video )
+            if len( page ) < page_size: break
+            start += page_size
+        # every video on the channel is new, so the old ones were all deleted
+        self.videos = []
+        self.known = set()
+        self.add( new )
+
+    def resync( self ):
+        """
+        Reads the whole channel again. The first page gives the number of
+        videos, and the rest of the pages are fetched concurrently.
+        """
+        # imported here since AUDLclasses imports this module (through MediaClasses)
+        from AUDLclasses import fan_out
+
+        first = self.get_page( 1, self.author )
+        videos = page_videos( first )
+        total = int( first.get( 'openSearch$totalResults', {} ).get( '$t', 0 ) )
+        starts = range( 1 + page_size, total + 1, page_size )
+        pages = fan_out( lambda start: page_videos( self.get_page( start, self.author ) ), starts )
+
+        # without a total, keep paging until a short page arrives
+        start = 1 + page_size
+        if not starts and len( videos ) == page_size:
+            while True:
+                page = page_videos( self.get_page( start, self.author ) )
+                pages.append( page )
+                if len( page ) < page_size: break
+                start += page_size
+
+        for page in pages: videos.extend( page )
+        self.videos = []
+        self.known = set()
+        self.add( videos )
+        self.syncs = 0
+
+    def add( self, new ):
+        """
+        Adds a list of videos, newest first, to the front of the list,
+        leaving out any it already has.
+        """
+        new = [video for video in new if video[1] not in self.known]
+        # a video on two pages (when one is posted part way through) is only added once
+        seen = set()
+        unique = []
+        for video in new:
+            if video[1] in seen: continue
+            seen.add( video[1] )
+            unique.append( video )
+        self.videos = unique + self.videos
+        self.known.update( seen )
+
+# The AUDL channel
+channel = Channel()
+
+#returns a list of the videos on the AUDL Channel with each list having 1. title, 2. url, 3.jpeg
+def get_youtube( ):
+    return channel.sync()
+
+#list begins at index 0 with the most recent video
 
 def main():
 
     list = get_youtube( )
-    
+